@@ -0,0 +1,27 @@
+# gunicorn 설정: gunicorn -c gunicorn.conf.py llm_agent.app:app
+# /chat은 SSE로 수십 초간 연결을 유지하므로 스레드 워커로 여러 요청을 동시에 처리
+import os
+import threading
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+
+# 워커마다 임베딩 모델/인덱스를 따로 로딩하므로 프로세스 수는 적게, 스레드 수로 동시성 확보
+# (gevent를 쓰려면 GUNICORN_WORKER_CLASS=gevent, 이 경우 threads 설정은 무시됨)
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("GUNICORN_WORKERS", "1"))
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+# 보고서 생성이 길어질 수 있으므로 넉넉하게
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = 60
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+# 워커 기동 직후 검색 엔진을 미리 로딩 (첫 요청이 로딩 시간을 떠안지 않도록)
+def post_worker_init(worker):
+    from llm_agent.app import search_engine
+    threading.Thread(target=search_engine.load, daemon=True).start()
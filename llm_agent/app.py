@@ -0,0 +1,196 @@
+# Flask 앱 (라우트, 검색 엔진/업로드 큐 구성)
+# 실행: python server.py (개발용) / gunicorn -c gunicorn.conf.py llm_agent.app:app (운영)
+from flask import Flask, request, jsonify
+import requests
+import os
+from llm_agent.sql_report import catalog, stream_sql_analysis, get_prompt_metrics
+from llm_agent.jobs import UploadJobQueue
+from llm_agent.graph import run_graph_generation
+import matplotlib.pyplot as plt
+from llm_agent.preprocess import preprocess_run
+from llm_agent.search import get_search_engine
+from flask import send_from_directory
+from flask import Flask, request, Response, stream_with_context
+import json
+import time
+import threading
+
+app = Flask(__name__, static_url_path="/static", static_folder=os.path.abspath("data"))
+
+# /chat 동시 처리 한도 (넘는 요청은 대기, 대기 시간은 /metrics에 기록)
+CHAT_CONCURRENCY = int(os.environ.get("CHAT_CONCURRENCY", "4"))
+chat_slots = threading.BoundedSemaphore(CHAT_CONCURRENCY)
+chat_metrics_lock = threading.Lock()
+serving_metrics = {
+    "concurrency_limit": CHAT_CONCURRENCY,
+    "active": 0,
+    "waiting": 0,
+    "completed": 0,
+    "failed": 0,
+    "total_queue_time": 0.0,
+    "max_queue_time": 0.0,
+    "total_request_time": 0.0,
+}
+
+
+def update_serving_metrics(**changes):
+    with chat_metrics_lock:
+        for key, value in changes.items():
+            if key == "max_queue_time":
+                serving_metrics[key] = max(serving_metrics[key], value)
+            else:
+                serving_metrics[key] += value
+
+@app.route("/")
+def home():
+    return "LLM Flask 서버가 실행 중입니다. /chat으로 POST 요청을 보내세요."
+
+# ChatBot Code
+@app.route("/chat", methods=["POST"])
+def chat():
+    data = request.get_json()
+    prompt = data.get("prompt", "")
+
+    def generate():
+        queued_at = time.perf_counter()
+        update_serving_metrics(waiting=1)
+        chat_slots.acquire()
+        queue_time = time.perf_counter() - queued_at
+        update_serving_metrics(waiting=-1, active=1, total_queue_time=queue_time, max_queue_time=queue_time)
+        print(f"[INFO] /chat 대기 시간: {queue_time:.2f}s")
+        started_at = time.perf_counter()
+        failed = 0
+        try:
+            print(f"[DEBUG-server.py] 사용자 프롬프트 수신: {prompt}")
+
+            # 보고서 토큰을 생성되는 즉시 전달
+            for kind, payload in stream_sql_analysis(prompt):
+                if kind == "token":
+                    yield f"event: token\ndata: {json.dumps({'text': payload}, ensure_ascii=False)}\n\n"
+                else:
+                    report_text, df_table, table_name = payload
+
+            print(f"[DEBUG-server.py] 보고서 생성 완료, 테이블 수: {len(df_table)}")
+
+            # 🔥 분석 데이터 전송
+            encoded_df_table = [df.to_json() for df in df_table]
+            yield f"event: analysis\ndata: {json.dumps({'df_table': encoded_df_table, 'table_name': table_name})}\n\n"
+
+            # 그래프 표시 여부 질문
+            yield f"event: graph_query\ndata: {json.dumps({'table_name': table_name})}\n\n"
+            yield "event: end\ndata: done\n\n"
+
+        except Exception as e:
+            failed = 1
+            yield f"data: ❌ 오류: {str(e)}\n\n"
+            yield "event: end\ndata: done\n\n"
+
+        finally:
+            # 클라이언트가 연결을 끊어도 슬롯 반환
+            chat_slots.release()
+            update_serving_metrics(
+                active=-1, completed=1 - failed, failed=failed,
+                total_request_time=time.perf_counter() - started_at
+            )
+
+    return Response(stream_with_context(generate()), content_type="text/event-stream")
+
+@app.route("/chat/metrics", methods=["GET"])
+def chat_metrics():
+    return jsonify(get_prompt_metrics())
+
+
+def get_serving_metrics():
+    with chat_metrics_lock:
+        metrics = dict(serving_metrics)
+    finished = metrics["completed"] + metrics["failed"]
+    metrics["avg_queue_time"] = metrics["total_queue_time"] / finished if finished else None
+    metrics["avg_request_time"] = metrics["total_request_time"] / finished if finished else None
+    return metrics
+
+
+# Search Code
+search_engine = get_search_engine()
+
+@app.route("/search", methods=["POST"])
+def search():
+    data = request.get_json(silent=True) or {}
+    query = data.get("query", "").strip()
+    if not query:
+        return jsonify({"results": []})
+
+    try:
+        results = search_engine.search(query)
+        return jsonify({"results": results})
+    except Exception as e:
+        return jsonify({"error" : f"검색 중 오류 발생 : {str(e)}"}), 500
+
+@app.route("/search/metrics", methods=["GET"])
+def search_metrics():
+    return jsonify(search_engine.get_metrics())
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "serving": get_serving_metrics(),
+        "chat": get_prompt_metrics(),
+        "search": search_engine.get_metrics(),
+    })
+
+
+# File Upload Code
+UPLOAD_FOLDER = os.path.abspath("./data/xlsx_data")
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# 전처리 이후 단계: DB 적재 → 검색 인덱스 갱신 (인덱스 갱신 실패는 업로드 실패로 보지 않음)
+# DB 적재는 카탈로그를 거쳐 catalog.refresh()와 같은 테이블을 동시에 쓰지 않도록 함
+def finish_upload(job_id, csv_path):
+    upload_jobs.update(job_id, status="loading")
+    table_name = catalog.load_table(csv_path)
+
+    upload_jobs.update(job_id, status="indexing")
+    try:
+        index_result = search_engine.index_csv(csv_path)
+        return {"csv_path": csv_path, "table": table_name, "index": index_result}
+    except Exception as e:
+        print(f"[ERROR] 검색 인덱스 갱신 실패: {e}")
+        return {"csv_path": csv_path, "table": table_name, "index_error": str(e)}
+
+
+upload_jobs = UploadJobQueue(preprocess_run, finish_upload)
+
+@app.route("/upload", methods=["POST"])
+def upload_file():
+    if 'file' not in request.files:
+        return jsonify({"error" : "파일이 없습니다."}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error" : "선택된 파일이 없습니다."}), 400
+
+    try:
+        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
+        file.save(file_path)
+        print(f"[DEBUG] 파일 저장 위치: {file_path}")
+        job_id = upload_jobs.submit(file_path, file.filename)
+    except Exception as e:
+        return jsonify({"error" : f"파일 저장 중 오류 발생 : {str(e)}"}), 500
+
+    # 전처리/적재/인덱싱은 백그라운드에서 진행, 상태는 /jobs/<job_id>로 확인
+    return jsonify({"message": "파일 업로드 성공", "filename": file.filename, "job_id": job_id}), 202
+
+@app.route("/jobs", methods=["GET"])
+def list_jobs():
+    return jsonify({"jobs": upload_jobs.list()})
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "작업을 찾을 수 없습니다."}), 404
+    return jsonify(job)
+
+@app.route('/static/graph/<path:filename>')
+def serve_graph(filename):
+    return send_from_directory(os.path.abspath('./graph'), filename)
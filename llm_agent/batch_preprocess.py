@@ -0,0 +1,171 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from llm_agent.preprocess import preprocess_excel_with_variable_header, data_save
+from llm_agent.xlsx_reader import list_sheet_names
+
+
+# 일괄 전처리 설정
+XLSX_DIR = os.path.join(BASE_DIR, "data", "xlsx_data")
+CSV_DIR = os.path.join(BASE_DIR, "data", "csv_data")
+MANIFEST_NAME = "preprocess_manifest.json"   # CSV_DIR 아래에 저장 (이전 실행의 파일 해시 포함)
+BATCH_WORKERS = max(1, (multiprocessing.cpu_count() or 2) - 1)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] 매니페스트 읽기 실패: {manifest_path}, 이유: {e}")
+        return {}
+
+
+def save_manifest(manifest, manifest_path):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+# 이전 실행에서 성공했고 내용이 같으며 결과 CSV가 남아 있으면 건너뜀
+def is_unchanged(entry, digest):
+    return (
+        entry is not None
+        and entry.get("sha256") == digest
+        and entry.get("status") == "ok"
+        and all(s["csv_path"] is None or os.path.exists(s["csv_path"]) for s in entry.get("sheets", []))
+    )
+
+
+# 워커 프로세스에서 실행: 시트 하나 전처리 후 CSV 저장 (시트가 여러 개면 "파일명_시트명.csv", 빈 시트는 저장하지 않음)
+def _preprocess_sheet(file_path, sheet_name, multi_sheet, save_path):
+    start = time.time()
+    df = preprocess_excel_with_variable_header(file_path, sheet_name=sheet_name)
+    csv_path = None
+    if len(df.columns):
+        csv_path = data_save(df, file_path, save_path, sheet_name if multi_sheet else None)
+    return {
+        "sheet": sheet_name,
+        "csv_path": csv_path,
+        "rows": len(df),
+        "columns": len(df.columns),
+        "seconds": time.time() - start,
+    }
+
+
+# 디렉터리의 모든 워크북/시트를 프로세스 풀에서 전처리하고 매니페스트(결과, 소요 시간, 실패 목록) 저장
+def preprocess_directory(xlsx_dir=XLSX_DIR, save_path=CSV_DIR, manifest_path=None,
+                         max_workers=BATCH_WORKERS, force=False):
+    started = time.time()
+    save_path = os.path.abspath(save_path)
+    os.makedirs(save_path, exist_ok=True)
+    manifest_path = manifest_path or os.path.join(save_path, MANIFEST_NAME)
+    previous = load_manifest(manifest_path).get("files", {})
+
+    files = {}
+    tasks = []
+    sheet_order = {}
+    failures = []
+    for path in sorted(glob.glob(os.path.join(xlsx_dir, "*.xlsx"))):
+        name = os.path.basename(path)
+        if name.startswith("~$"):   # 엑셀 임시 파일
+            continue
+        try:
+            hash_start = time.time()
+            digest = file_hash(path)
+            hash_time = time.time() - hash_start
+            if not force and is_unchanged(previous.get(name), digest):
+                files[name] = dict(previous[name], skipped=True)
+                continue
+            sheet_names = list_sheet_names(path)
+        except Exception as e:
+            print(f"[ERROR] 파일 처리 실패: {path}, 이유: {e}")
+            files[name] = {"sha256": None, "status": "failed", "skipped": False, "error": str(e), "sheets": []}
+            failures.append({"file": name, "sheet": None, "error": str(e)})
+            continue
+
+        files[name] = {"sha256": digest, "status": "ok", "skipped": False, "error": None,
+                       "sheets": [], "timings": {"hash": hash_time}}
+        sheet_order[name] = sheet_names
+        tasks += [(name, path, sheet, len(sheet_names) > 1) for sheet in sheet_names]
+
+    print(f"[INFO] 대상 파일 {len(files)}개, 전처리할 시트 {len(tasks)}개")
+
+    # torch/faiss를 로딩한 프로세스에서 호출해도 안전하도록 spawn 사용 (jobs.UploadJobQueue와 동일)
+    if tasks:
+        with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                pool.submit(_preprocess_sheet, path, sheet, multi_sheet, save_path): (name, sheet)
+                for name, path, sheet, multi_sheet in tasks
+            }
+            for future in as_completed(futures):
+                name, sheet = futures[future]
+                entry = files[name]
+                try:
+                    entry["sheets"].append(future.result())
+                except Exception as e:
+                    print(f"[ERROR] 시트 처리 실패: {name} / {sheet}, 이유: {e}")
+                    entry["status"] = "failed"
+                    entry["sheets"].append({"sheet": sheet, "error": str(e)})
+                    failures.append({"file": name, "sheet": sheet, "error": str(e)})
+
+    # 시트 결과는 끝난 순서로 모이므로 워크북 순서로 정렬
+    for name, sheet_names in sheet_order.items():
+        entry = files[name]
+        entry["sheets"].sort(key=lambda s: sheet_names.index(s["sheet"]))
+        entry["timings"]["preprocess"] = sum(s.get("seconds", 0) for s in entry["sheets"])
+
+    manifest = {
+        "xlsx_dir": os.path.abspath(xlsx_dir),
+        "save_path": save_path,
+        "started": started,
+        "elapsed": time.time() - started,
+        "workers": max_workers,
+        "summary": {
+            "files": len(files),
+            "processed": sum(not e["skipped"] for e in files.values()),
+            "skipped": sum(e["skipped"] for e in files.values()),
+            "failed": sum(e["status"] == "failed" for e in files.values()),
+            "sheets": len(tasks),
+        },
+        "failures": failures,
+        "files": files,
+    }
+    save_manifest(manifest, manifest_path)
+    print(f"[INFO] 일괄 전처리 완료: {manifest['summary']}, {manifest['elapsed']:.2f}s")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="디렉터리 내 엑셀 파일(모든 시트) 일괄 전처리")
+    parser.add_argument("xlsx_dir", nargs="?", default=XLSX_DIR)
+    parser.add_argument("--save-path", default=CSV_DIR)
+    parser.add_argument("--manifest", default=None, help=f"기본값: <save-path>/{MANIFEST_NAME}")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--force", action="store_true", help="내용이 바뀌지 않은 파일도 다시 처리")
+    args = parser.parse_args()
+
+    manifest = preprocess_directory(args.xlsx_dir, args.save_path, args.manifest, args.workers, args.force)
+    sys.exit(1 if manifest["failures"] else 0)
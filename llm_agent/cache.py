@@ -0,0 +1,106 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISS = object()
+
+
+# 크기/TTL 제한 LRU 캐시 (선택적으로 SQLite 디스크 계층 사용)
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None, disk_path=None, namespace="default"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.namespace = namespace
+        self._data = OrderedDict()  # key -> (value, version, created)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "invalidated": 0}
+
+        self._disk = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT, key TEXT, version TEXT, value BLOB, created REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._disk.commit()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key, version=None, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, entry_version, created = entry
+                if entry_version == version and not self._expired(created):
+                    self._data.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                # 버전이 바뀌었거나 만료된 항목은 폐기
+                del self._data[key]
+                self._stats["invalidated"] += 1
+
+            value = self._disk_get(key, version)
+            if value is not _MISS:
+                self._stats["hits"] += 1
+                self._stats["disk_hits"] += 1
+                self._put(key, value, version, time.time())
+                return value
+
+            self._stats["misses"] += 1
+            return default
+
+    def set(self, key, value, version=None):
+        created = time.time()
+        with self._lock:
+            self._put(key, value, version, created)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, str(version), pickle.dumps(value), created)
+                )
+                self._disk.commit()
+
+    def _put(self, key, value, version, created):
+        self._data[key] = (value, version, created)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _disk_get(self, key, version):
+        if self._disk is None:
+            return _MISS
+        row = self._disk.execute(
+            "SELECT version, value, created FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return _MISS
+        disk_version, blob, created = row
+        if disk_version != str(version) or self._expired(created):
+            self._disk.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            self._disk.commit()
+            return _MISS
+        return pickle.loads(blob)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+                self._disk.commit()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._data)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else None
+        return stats
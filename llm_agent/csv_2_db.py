@@ -1,8 +1,15 @@
 import os
+import sys
 import glob
 import pandas as pd
 import sqlite3
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from llm_agent.schema_catalog import csv_version, record_table_version
+
 
 if __name__ == "__main__":
     # DB 경로 설정
@@ -23,6 +30,7 @@ if __name__ == "__main__":
         file_name = os.path.basename(cp).replace(".csv", "")
         df = pd.read_csv(cp)
         df.to_sql(file_name, conn, if_exists="replace", index=False)
+        record_table_version(conn, file_name, csv_version(cp))
 
     # 연결 종료
     conn.close()
\ No newline at end of file
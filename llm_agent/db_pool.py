@@ -0,0 +1,44 @@
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+
+# 읽기 전용 SQLite 연결 풀 (SELECT 병렬 실행용, 필요할 때 size개까지 생성)
+class ReadOnlyPool:
+    def __init__(self, db_path, size=4):
+        self.db_path = db_path
+        self.size = size
+        self._pool = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
@@ -1,7 +1,15 @@
 import os
+import sys
 import glob
+import argparse
 import re
-import pickle
+import json
+import time
+from functools import partial
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import faiss
@@ -9,10 +17,32 @@ import torch
 from transformers import AutoTokenizer, AutoModel
 
 # 설정 경로
-CSV_DIR = os.path.abspath("../data/csv_data")
-FAISS_INDEX_PATH = os.path.abspath("../data/faiss/faiss_index.idx")
-META_PATH = os.path.abspath("../data/faiss/faiss_meta.pkl")
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # == /app
+
+# 스크립트로 직접 실행해도 llm_agent 패키지를 import할 수 있도록 경로 추가
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+from llm_agent.ngram_index import RowNgramIndex
+from llm_agent.meta_store import MetaStore
+from llm_agent.embedding_cache import EmbeddingCache
+from llm_agent.encoder import ENCODER_BACKENDS, OnnxEncoder, load_encoder, quantize_model
+
+CSV_DIR = os.path.join(BASE_DIR, "data", "csv_data")
+FAISS_INDEX_PATH = os.path.join(BASE_DIR, "data", "faiss", "faiss_index.idx")
+META_PATH = os.path.join(BASE_DIR, "data", "faiss", "faiss_meta")  # 컬럼형 메타 저장소 prefix
+NGRAM_PATH = os.path.join(BASE_DIR, "data", "faiss", "faiss_ngram")  # 메타 행 n-gram 역색인 prefix
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "data", "faiss", "embedding_cache.npz")
 MODEL_NAME = "nlpai-lab/KURE-v1"
+SMALL_MODEL_PATH = os.path.join(BASE_DIR, "llm_agent", "kpf-sbert-128d-v1")  # 128차원 SentenceTransformer
+
+# 인덱스 설정 ("flat": 전수 검색, "ivf": IVF-Flat, "hnsw": HNSW 그래프)
+INDEX_TYPE = "flat"
+IVF_NPROBE = 16       # 검색 시 탐색할 클러스터 수 (클수록 재현율↑, 속도↓)
+HNSW_M = 32           # HNSW 노드당 연결 수
+HNSW_EF_SEARCH = 64   # HNSW 검색 후보 수 (클수록 재현율↑, 속도↓)
+
+# 인코딩 설정
+TOKEN_BUDGET = 4096   # 버킷 배치당 (배치 크기 × 최대 토큰 길이) 상한
 
 # 문자열 정규화 함수
 def normalize_token(text):
@@ -33,38 +63,294 @@ def encode_texts(texts, tokenizer, model, device, batch_size=32):
         vecs.append(out.cpu().numpy())
     return np.vstack(vecs)
 
-# 임베딩 + 메타데이터 생성
-def embed_csv_files(csv_dir, tokenizer, model, device):
+# 길이 버킷 배치 구성: 토큰 길이순 정렬 후 (배치 크기 × 최대 길이)가 token_budget 이하가 되도록 분할
+def make_length_buckets(lengths, token_budget=TOKEN_BUDGET, max_batch_size=256):
+    order = np.argsort(lengths, kind="stable")
+    batches = []
+    current = []
+    for i in order.tolist():
+        # 정렬되어 있으므로 현재 원소 길이가 배치의 최대 길이
+        if current and ((len(current) + 1) * lengths[i] > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+# 길이 버킷 + 토크나이즈 전용 스레드로 임베딩 (결과는 입력 순서)
+# 버킷은 문자 길이로 구성 (토큰 수는 대부분 문자 수 + 2 이하이므로 token_budget을 넘지 않는 쪽으로 추정),
+# 실제 토크나이즈는 워커 스레드에서 배치 단위로 수행해 모델 추론과 겹침
+@torch.no_grad()
+def encode_texts_bucketed(texts, tokenizer, model, device, token_budget=TOKEN_BUDGET, verbose=True):
+    if not texts:
+        return np.zeros((0, model.config.hidden_size), dtype=np.float32)
+
+    start = time.perf_counter()
+    texts = list(texts)
+    lengths = np.minimum(np.array([len(text) + 2 for text in texts]), 128)
+    batches = make_length_buckets(lengths, token_budget)
+
+    batch_queue = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    errors = []
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                batch_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    # 토크나이저 워커: 실패해도 종료 표시(None)는 반드시 넣고, 예외는 소비 측에서 다시 발생
+    def produce():
+        try:
+            for batch in batches:
+                enc = tokenizer([texts[i] for i in batch], padding=True, truncation=True,
+                                return_tensors="pt", max_length=128)
+                if not put((batch, enc)):
+                    return
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            put(None)
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+
+    vecs = np.zeros((len(texts), model.config.hidden_size), dtype=np.float32)
+    tokens = padded = 0
+    try:
+        while True:
+            item = batch_queue.get()
+            if item is None:
+                break
+            batch, enc = item
+            mask = enc["attention_mask"]
+            tokens += int(mask.sum())
+            padded += mask.numel()
+            out = model(**enc.to(device)).last_hidden_state[:, 0]
+            vecs[batch] = torch.nn.functional.normalize(out, dim=1).cpu().numpy()
+    finally:
+        stop.set()
+        worker.join()
+    if errors:
+        raise errors[0]
+
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f"[INFO] 버킷 인코딩: {len(texts)}개, 배치 {len(batches)}개, "
+              f"{len(texts) / elapsed:.1f} texts/s, 패딩 비율 {1 - tokens / max(padded, 1):.1%}")
+    return vecs
+
+# 멀티 프로세스 인코딩 워커 (프로세스마다 모델을 한 번 로딩)
+_worker_state = {}
+
+def _init_encode_worker(model_name, num_threads, backend="fp32"):
+    torch.set_num_threads(num_threads)
+    _worker_state["tokenizer"] = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    _worker_state["model"] = quantize_model(model) if backend == "int8" else model
+
+def _encode_chunk(texts, token_budget):
+    return encode_texts_bucketed(texts, _worker_state["tokenizer"], _worker_state["model"],
+                                 torch.device("cpu"), token_budget, verbose=False)
+
+# 여러 CPU 프로세스에 나눠 임베딩 (길이가 고르게 섞이도록 교차 분할, backend: "fp32" 또는 "int8")
+def encode_texts_parallel(texts, model_name=MODEL_NAME, num_procs=2, token_budget=TOKEN_BUDGET, backend="fp32"):
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    start = time.perf_counter()
+    chunks = [list(range(p, len(texts), num_procs)) for p in range(num_procs)]
+    num_threads = max(1, (os.cpu_count() or 1) // num_procs)
+
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(num_procs, mp_context=ctx, initializer=_init_encode_worker,
+                             initargs=(model_name, num_threads, backend)) as pool:
+        futures = [pool.submit(_encode_chunk, [texts[i] for i in chunk], token_budget) for chunk in chunks if chunk]
+        results = [f.result() for f in futures]
+
+    vecs = np.zeros((len(texts), results[0].shape[1]), dtype=np.float32)
+    for chunk, result in zip([c for c in chunks if c], results):
+        vecs[chunk] = result
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] 병렬 인코딩({num_procs} 프로세스): {len(texts)}개, {len(texts) / elapsed:.1f} texts/s")
+    return vecs
+
+# 테이블명, 컬럼명, 텍스트 셀 값 수집
+def collect_table_words(csv_path):
+    table_name = os.path.basename(csv_path).replace(".csv", "")
+    df = pd.read_csv(csv_path)
+
+    words = set()
+    words.add(table_name)
+    words.update(df.columns)
+
+    text_cols = df.select_dtypes(include='object').columns
+    for col in text_cols:
+        values = df[col].dropna().unique().tolist()
+        words.update(str(v) for v in values)
+
+    return table_name, list(words)
+
+# 임베딩 + 메타데이터 생성 (cache가 주어지면 코퍼스 전체에서 고유 문자열만 한 번씩 임베딩)
+def embed_csv_files(csv_dir, tokenizer, model, device, cache=None, encode_fn=None):
     file_word_embeddings = {}
     file_token_index = {}
+    table_words = {}
 
     csv_files = glob.glob(os.path.join(csv_dir, "*.csv"))
     print("발견된 CSV 파일 수:", len(csv_files))
     for csv_path in csv_files:
-        table_name = os.path.basename(csv_path).replace(".csv", "")
-        df = pd.read_csv(csv_path)
+        table_name, words = collect_table_words(csv_path)
 
         norm_name = normalize_token(table_name)
         file_token_index[table_name] = [norm_name]
+        table_words[table_name] = words
 
-        words = set()
-        words.add(table_name)
-        words.update(df.columns)
+    if cache is None:
+        cache = EmbeddingCache(model_name=MODEL_NAME)
+    if encode_fn is None:
+        encode_fn = lambda texts: encode_texts(texts, tokenizer, model, device)
+    all_words = [w for words in table_words.values() for w in words]
+    all_embeddings = cache.encode(all_words, encode_fn)
 
-        text_cols = df.select_dtypes(include='object').columns
-        for col in text_cols:
-            values = df[col].dropna().unique().tolist()
-            words.update(str(v) for v in values)
-
-        words = list(words)
-        embeddings = encode_texts(words, tokenizer, model, device)
+    start = 0
+    for table_name, words in table_words.items():
+        embeddings = all_embeddings[start:start + len(words)]
+        start += len(words)
         word_embeddings = {w: emb for w, emb in zip(words, embeddings)}
         file_word_embeddings[table_name] = word_embeddings
 
     return file_word_embeddings, file_token_index
 
+# 차원 축소/PQ용 index_factory 문자열 생성
+def index_factory_string(d, index_type, nlist, hnsw_m, reduce_dim=None, opq=False, pq_m=None, pq_nbits=8):
+    out_dim = reduce_dim or d
+    parts = []
+    if opq:
+        if not pq_m:
+            raise ValueError("OPQ는 --pq-m과 함께 사용해야 합니다.")
+        parts.append(f"OPQ{pq_m}_{out_dim}")
+    elif reduce_dim:
+        parts.append(f"PCA{reduce_dim}")
+    if reduce_dim:
+        # 투영 후 다시 정규화해 내적 = 코사인 유사도 유지
+        parts.append("L2norm")
+
+    encoding = f"PQ{pq_m}x{pq_nbits}" if pq_m else "Flat"
+    if index_type == "flat":
+        parts.append(encoding)
+    elif index_type == "ivf":
+        parts.append(f"IVF{nlist},{encoding}")
+    elif index_type == "hnsw":
+        if pq_m:
+            raise ValueError("HNSW 인덱스는 PQ 옵션을 지원하지 않습니다.")
+        parts.append(f"HNSW{hnsw_m},Flat")
+    else:
+        raise ValueError(f"지원하지 않는 인덱스 유형: {index_type}")
+    return ",".join(parts)
+
+
+# FAISS 인덱스 생성 (내적 = 정규화 벡터의 코사인 유사도, id = 메타 행 번호)
+def build_faiss_index(vec_matrix, index_type=INDEX_TYPE, nlist=None, nprobe=IVF_NPROBE,
+                      hnsw_m=HNSW_M, ef_search=HNSW_EF_SEARCH, reduce_dim=None, opq=False, pq_m=None):
+    n, d = vec_matrix.shape
+
+    if index_type == "ivf":
+        # 클러스터당 최소 39개 학습 벡터가 필요하므로 데이터 크기에 맞춰 nlist 제한
+        if nlist is None:
+            nlist = int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n // 39))
+
+    if reduce_dim or pq_m:
+        # PCA/OPQ 투영 + (선택) PQ 압축: 학습 벡터 수가 적으면 PQ 코드 비트 수를 줄임
+        pq_nbits = int(min(8, np.log2(max(n, 2))))
+        factory = index_factory_string(d, index_type, nlist, hnsw_m, reduce_dim, opq, pq_m, pq_nbits)
+        index = faiss.index_factory(d, factory, faiss.METRIC_INNER_PRODUCT)
+        index.train(vec_matrix)
+        params = faiss.ParameterSpace()
+        if index_type == "ivf":
+            params.set_index_parameter(index, "nprobe", min(nprobe, nlist))
+        elif index_type == "hnsw":
+            params.set_index_parameter(index, "efSearch", ef_search)
+        print(f"[INFO] index_factory: {factory}")
+    elif index_type == "flat":
+        index = faiss.IndexFlatIP(d)
+    elif index_type == "ivf":
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(vec_matrix)
+        index.nprobe = min(nprobe, nlist)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = ef_search
+    else:
+        raise ValueError(f"지원하지 않는 인덱스 유형: {index_type}")
+
+    # IVF는 자체적으로 id를 지원하고, 그 외에는 IDMap으로 감싸 증분 추가/삭제를 지원
+    if not isinstance(index, faiss.IndexIVF):
+        index = faiss.IndexIDMap2(index)
+    index.add_with_ids(vec_matrix, np.arange(n, dtype=np.int64))
+    return index
+
+
+# id 매핑이 없는 기존 인덱스(IndexFlatIP 등)를 IDMap으로 변환
+def ensure_id_map(index):
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIVF)):
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    base = faiss.clone_index(index)
+    base.reset()
+    id_index = faiss.IndexIDMap2(base)
+    id_index.add_with_ids(vectors, np.arange(index.ntotal, dtype=np.int64))
+    return id_index
+
+
+# 테이블의 메타 행 id (삭제된 행 제외)
+def table_row_ids(meta, table_name):
+    if isinstance(meta, MetaStore):
+        return meta.row_ids_for_file(table_name)
+    return [i for i, row in enumerate(meta) if row is not None and row[0] == table_name]
+
+
+# 테이블 벡터 삭제 (삭제 미지원 인덱스는 메타에서만 제거해 검색 시 무시)
+def remove_table_vectors(index, ids, table_name):
+    if not ids:
+        return 0
+    try:
+        index.remove_ids(np.array(ids, dtype=np.int64))
+    except RuntimeError:
+        print(f"[WARN] 인덱스가 벡터 삭제를 지원하지 않아 메타에서만 제외합니다: {table_name}")
+    return len(ids)
+
+
+# 테이블 벡터 추가 (id는 메타 리스트 끝에 이어서 부여)
+def add_table_vectors(index, start, embeddings):
+    ids = np.arange(start, start + len(embeddings), dtype=np.int64)
+    index.add_with_ids(np.asarray(embeddings, dtype=np.float32), ids)
+    return len(ids)
+
+
+# 인덱스/메타/n-gram 역색인 저장 (임시 파일에 쓴 뒤 교체)
+def save_index_files(index, meta, faiss_path, meta_path, ngram_path, word_index):
+    tmp_path = faiss_path + ".tmp"
+    faiss.write_index(index, tmp_path)
+
+    if not isinstance(meta, MetaStore):
+        meta = MetaStore.from_rows(meta)
+    meta.save(meta_path)
+    word_index.save(ngram_path, removed=meta.removed_ids())
+
+    # 인덱스 파일을 마지막에 교체 (검색 엔진은 인덱스 파일 변경으로 갱신을 감지)
+    os.replace(tmp_path, faiss_path)
+
+
 # FAISS 인덱스 및 메타 저장
-def build_and_save_faiss_index(file_word_embeddings, faiss_path, meta_path):
+def build_and_save_faiss_index(file_word_embeddings, faiss_path, meta_path, index_type=INDEX_TYPE,
+                               ngram_path=None, model_name=MODEL_NAME, **index_params):
     meta = []
     all_vectors = []
     for file_name, word_dict in file_word_embeddings.items():
@@ -74,24 +360,87 @@ def build_and_save_faiss_index(file_word_embeddings, faiss_path, meta_path):
             meta.append((file_name, word_norm, word_raw))
 
     vec_matrix = np.vstack(all_vectors).astype(np.float32)
-    index = faiss.IndexFlatIP(vec_matrix.shape[1])
-    index.add(vec_matrix)
+    index = build_faiss_index(vec_matrix, index_type, **index_params)
+    print(f"[INFO] {index_type} 인덱스 생성 완료: 벡터 {index.ntotal}개")
 
-    faiss.write_index(index, faiss_path)
-    with open(meta_path, "wb") as f:
-        pickle.dump(meta, f)
+    # 부분 포함 검색용 메타 행 n-gram 역색인 (메타 파일 옆에 저장)
+    if ngram_path is None:
+        ngram_path = os.path.join(os.path.dirname(meta_path), "faiss_ngram")
+    word_index = RowNgramIndex.build([word_norm for _, word_norm, _ in meta])
+    save_index_files(index, meta, faiss_path, meta_path, ngram_path, word_index)
+
+    # 검색 시 같은 모델로 쿼리를 임베딩하도록 인덱스 설정 저장
+    config = {"model_name": model_name, "index_type": index_type, "dim": int(vec_matrix.shape[1])}
+    config.update({k: v for k, v in index_params.items() if v})
+    with open(os.path.splitext(faiss_path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
 
     return index, meta
 
 # 메인 실행
 if __name__ == "__main__":
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModel.from_pretrained(MODEL_NAME).to(device)
-    model.eval()
+    parser = argparse.ArgumentParser(description="CSV 데이터로 FAISS 검색 인덱스 생성")
+    parser.add_argument("--index-type", choices=["flat", "ivf", "hnsw"], default=INDEX_TYPE)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF 클러스터 수 (기본: 4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, default=IVF_NPROBE, help="IVF 검색 클러스터 수")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M, help="HNSW 연결 수")
+    parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH, help="HNSW 검색 후보 수")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="임베딩 캐시를 읽거나 저장하지 않음")
+    parser.add_argument("--bucketed", action="store_true", help="토큰 길이 버킷 배치로 인코딩")
+    parser.add_argument("--token-budget", type=int, default=TOKEN_BUDGET, help="버킷 배치당 토큰 수 상한")
+    parser.add_argument("--num-procs", type=int, default=1, help="인코딩 CPU 프로세스 수 (2 이상이면 병렬)")
+    parser.add_argument("--backend", choices=ENCODER_BACKENDS, default="fp32", help="인코더 백엔드 (int8/onnx는 CPU)")
+    parser.add_argument("--model", choices=["kure", "kpf128"], default="kure",
+                        help="임베딩 모델 (kpf128: 128차원 kpf-sbert-128d-v1)")
+    parser.add_argument("--reduce-dim", type=int, default=None, help="PCA(또는 OPQ) 투영 차원 (예: 128)")
+    parser.add_argument("--opq", action="store_true", help="PCA 대신 OPQ 회전 사용 (--pq-m 필요)")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ 서브 양자화기 수 (투영 차원의 약수)")
+    args = parser.parse_args()
+
+    # 적용되지 않는 옵션 조합은 거부 (캐시 키에 백엔드가 들어가므로 다른 벡터가 섞이지 않도록)
+    if args.model == "kpf128" and (args.backend != "fp32" or args.bucketed or args.num_procs > 1):
+        parser.error("--model kpf128은 SentenceTransformer(fp32)로만 인코딩합니다 (--backend/--bucketed/--num-procs 미지원)")
+    if args.backend == "onnx" and (args.bucketed or args.num_procs > 1):
+        parser.error("--backend onnx는 --bucketed/--num-procs를 지원하지 않습니다")
+
+    device = torch.device("cuda" if torch.cuda.is_available() and args.backend == "fp32" else "cpu")
+    tokenizer, model = None, None
+    model_name = MODEL_NAME if args.model == "kure" else SMALL_MODEL_PATH
+    if args.num_procs <= 1 and args.backend != "onnx" and args.model == "kure":  # 병렬 모드에서는 워커 프로세스가 각자 모델을 로딩
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        model = AutoModel.from_pretrained(MODEL_NAME).to(device)
+        model.eval()
+        if args.backend == "int8":
+            model = quantize_model(model)
 
-    # 1. CSV → 임베딩
-    file_word_embeddings, file_token_index = embed_csv_files(CSV_DIR, tokenizer, model, device)
+    # 1. CSV → 임베딩 (이전 빌드의 임베딩 재사용)
+    cache_path = None if args.no_embedding_cache else EMBEDDING_CACHE_PATH
+    cache = EmbeddingCache(cache_path, f"{model_name}:{args.backend}")
+    if args.model == "kpf128":
+        # 128차원 출력은 SentenceTransformer의 Dense 레이어에서 나오므로 CLS 인코더 대신 사용
+        encode_fn = partial(load_encoder(SMALL_MODEL_PATH, "fp32", device=str(device)).encode,
+                            convert_to_numpy=True, normalize_embeddings=True)
+    elif args.backend == "onnx":
+        # 검색 쪽(llm_agent/KURE-v1)과 같은 ONNX 파일 사용
+        encode_fn = OnnxEncoder(MODEL_NAME, os.path.join(BASE_DIR, "llm_agent", "KURE-v1", "onnx", "model.onnx")).encode
+    elif args.num_procs > 1:
+        encode_fn = lambda texts: encode_texts_parallel(texts, MODEL_NAME, args.num_procs, args.token_budget,
+                                                        args.backend)
+    elif args.bucketed:
+        encode_fn = lambda texts: encode_texts_bucketed(texts, tokenizer, model, device, args.token_budget)
+    else:
+        encode_fn = None
+    file_word_embeddings, file_token_index = embed_csv_files(CSV_DIR, tokenizer, model, device, cache, encode_fn)
+    cache.save()
+    report = cache.report()
+    print("[INFO] 임베딩 캐시 통계:", report)
+    if report["encode_time"] > 0:
+        print(f"[INFO] 인코딩 처리량: {report['misses'] / report['encode_time']:.1f} texts/s "
+              f"({report['misses']}개, {report['encode_time']:.1f}s)")
 
     # 2. FAISS 인덱스 생성 및 저장
-    index, meta = build_and_save_faiss_index(file_word_embeddings, FAISS_INDEX_PATH, META_PATH)
+    index, meta = build_and_save_faiss_index(
+        file_word_embeddings, FAISS_INDEX_PATH, META_PATH, args.index_type, ngram_path=NGRAM_PATH,
+        model_name=model_name, nlist=args.nlist, nprobe=args.nprobe, hnsw_m=args.hnsw_m, ef_search=args.ef_search,
+        reduce_dim=args.reduce_dim, opq=args.opq, pq_m=args.pq_m
+    )
@@ -0,0 +1,72 @@
+import os
+import time
+import hashlib
+import unicodedata
+import numpy as np
+
+
+# 텍스트 해시 → 임베딩 벡터 캐시 (코퍼스 전체와 재빌드 간에 공유, npz로 저장)
+class EmbeddingCache:
+    def __init__(self, path=None, model_name=""):
+        self.path = path
+        self.model_name = model_name
+        self.vectors = {}
+        self.stats = {"hits": 0, "misses": 0, "encode_time": 0.0}
+        if path and os.path.exists(path):
+            self.load()
+
+    # 모델 입력이 달라지지 않는 범위(유니코드 NFC, 앞뒤 공백)에서만 정규화
+    def key(self, text):
+        text = unicodedata.normalize("NFC", str(text)).strip()
+        return hashlib.sha1(f"{self.model_name}\0{text}".encode("utf-8")).digest()
+
+    def load(self):
+        data = np.load(self.path)
+        if str(data["model_name"]) != self.model_name:
+            print(f"[INFO] 모델이 달라 임베딩 캐시를 사용하지 않습니다: {data['model_name']}")
+            return
+        self.vectors = {k.tobytes(): v for k, v in zip(data["keys"], data["vectors"])}
+        print(f"[INFO] 임베딩 캐시 로딩: {len(self.vectors)}개")
+
+    def save(self):
+        if not self.path or not self.vectors:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 'S' dtype은 끝의 NULL 바이트를 잘라내므로 uint8 배열로 저장
+        keys = np.frombuffer(b"".join(self.vectors.keys()), dtype=np.uint8).reshape(-1, 20)
+        vectors = np.vstack(list(self.vectors.values())).astype(np.float32)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=vectors, model_name=np.array(self.model_name))
+        os.replace(tmp_path, self.path)
+
+    # 캐시에 없는 텍스트만 encode_fn으로 한 번씩 임베딩
+    def encode(self, texts, encode_fn):
+        keys = [self.key(t) for t in texts]
+        missing = {}
+        for text, k in zip(texts, keys):
+            if k not in self.vectors and k not in missing:
+                missing[k] = text
+
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            start = time.perf_counter()
+            vectors = encode_fn(list(missing.values()))
+            self.stats["encode_time"] += time.perf_counter() - start
+            for k, vec in zip(missing.keys(), vectors):
+                self.vectors[k] = vec
+
+        return np.vstack([self.vectors[k] for k in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def report(self):
+        hits, misses = self.stats["hits"], self.stats["misses"]
+        total = hits + misses
+        per_text = self.stats["encode_time"] / misses if misses else 0.0
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else None,
+            "encode_time": self.stats["encode_time"],
+            "estimated_time_saved": hits * per_text,
+            "cached_vectors": len(self.vectors),
+        }
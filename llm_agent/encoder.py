@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import torch
+from transformers import AutoTokenizer, AutoModel
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+
+# 인코더 백엔드 ("fp32": SentenceTransformer 원본, "int8": 동적 양자화, "onnx": ONNX Runtime)
+ENCODER_BACKEND = "fp32"
+ENCODER_BACKENDS = ("fp32", "int8", "onnx")
+MAX_LENGTH = 128
+
+
+# Linear 레이어 int8 동적 양자화 (CPU 전용)
+def quantize_model(model):
+    return torch.ao.quantization.quantize_dynamic(model.cpu(), {torch.nn.Linear}, dtype=torch.qint8).eval()
+
+
+# CLS 풀링 + 정규화 인코더 (SentenceTransformer.encode와 같은 호출 방식)
+class TransformerEncoder:
+    def __init__(self, model_path, backend="fp32"):
+        self.backend = backend
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModel.from_pretrained(model_path).eval()
+        self.model = quantize_model(model) if backend == "int8" else model
+
+    @torch.no_grad()
+    def _encode_batch(self, batch):
+        enc = self.tokenizer(batch, padding=True, truncation=True, return_tensors="pt", max_length=MAX_LENGTH)
+        return self.model(**enc).last_hidden_state[:, 0].numpy()
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        vecs = np.vstack([self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+        if normalize_embeddings:
+            vecs = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+        vecs = vecs.astype(np.float32)
+        return vecs[0] if single else vecs
+
+
+# ONNX Runtime 인코더 (모델 폴더의 onnx/model.onnx가 없으면 내보내기 후 사용)
+class OnnxEncoder(TransformerEncoder):
+    def __init__(self, model_path, onnx_path=None):
+        import onnxruntime as ort
+
+        self.backend = "onnx"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        if onnx_path is None:
+            onnx_path = os.path.join(model_path, "onnx", "model.onnx")
+        if not os.path.exists(onnx_path):
+            export_onnx(model_path, onnx_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, batch):
+        enc = self.tokenizer(batch, padding=True, truncation=True, return_tensors="np", max_length=MAX_LENGTH)
+        inputs = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+        return self.session.run(None, inputs)[0][:, 0]
+
+
+# 내보내기용 래퍼 (transformers 버전별 forward 위치 인자 차이를 피하기 위해 키워드로 호출)
+class _HiddenStateModule(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+def export_onnx(model_path, onnx_path):
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = _HiddenStateModule(AutoModel.from_pretrained(model_path).eval())
+    sample = tokenizer(["인구 현황"], return_tensors="pt")
+
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    torch.onnx.export(
+        model,
+        (sample["input_ids"], sample["attention_mask"]),
+        onnx_path,
+        input_names=["input_ids", "attention_mask"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        opset_version=17,
+        dynamo=False,
+    )
+    print(f"[INFO] ONNX 모델 내보내기 완료: {onnx_path}")
+
+
+# SentenceTransformer 구성이 Transformer → CLS Pooling (→ Normalize)뿐인지 확인
+# (Dense 레이어 등이 있으면 TransformerEncoder/OnnxEncoder의 CLS 출력과 차원/값이 달라짐, 예: kpf-sbert-128d-v1)
+def supports_cls_backend(model_path):
+    modules_path = os.path.join(model_path, "modules.json")
+    if not os.path.exists(modules_path):
+        return True
+    with open(modules_path, encoding="utf-8") as f:
+        modules = json.load(f)
+    for module in modules:
+        kind = module["type"].rsplit(".", 1)[-1]
+        if kind == "Pooling":
+            config_path = os.path.join(model_path, module.get("path", ""), "config.json")
+            if os.path.exists(config_path):
+                with open(config_path, encoding="utf-8") as f:
+                    if not json.load(f).get("pooling_mode_cls_token"):
+                        return False
+        elif kind not in ("Transformer", "Normalize"):
+            return False
+    return True
+
+
+def load_encoder(model_path, backend=ENCODER_BACKEND, device="cpu"):
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"지원하지 않는 인코더 백엔드: {backend}")
+    if backend != "fp32" and not supports_cls_backend(model_path):
+        raise ValueError(f"{backend} 백엔드는 CLS 풀링 모델만 지원합니다 (fp32 사용): {model_path}")
+    if backend == "fp32":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_path, device=device)
+    if backend == "int8":
+        return TransformerEncoder(model_path, "int8")
+    if backend == "onnx":
+        return OnnxEncoder(model_path)
+    raise ValueError(f"지원하지 않는 인코더 백엔드: {backend}")
+
+
+# fp32 기준 모델과 후보 백엔드의 코사인 유사도/지연 시간 비교
+def check_parity(reference, candidate, texts, top_k=10):
+    start = time.perf_counter()
+    ref = reference.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    ref_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cand = candidate.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+    cand_time = time.perf_counter() - start
+
+    cosine = np.sum(ref * cand, axis=1)
+
+    # 검색 재현율: 같은 텍스트 집합 안에서 최근접 이웃 top_k가 얼마나 유지되는지
+    k = min(top_k, len(texts) - 1)
+    recall = None
+    if k > 0:
+        ref_top = np.argsort(-(ref @ ref.T), axis=1)[:, 1:k + 1]
+        cand_top = np.argsort(-(cand @ ref.T), axis=1)[:, 1:k + 1]
+        recall = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]))
+
+    return {
+        "texts": len(texts),
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        f"recall@{k}": recall,
+        "reference_ms_per_text": ref_time / len(texts) * 1000,
+        "candidate_ms_per_text": cand_time / len(texts) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="인코더 백엔드 정합성(fp32 대비) 확인")
+    parser.add_argument("--model-path", default=os.path.join(BASE_DIR, "llm_agent", "KURE-v1"))
+    parser.add_argument("--backend", choices=["int8", "onnx"], default="int8")
+    parser.add_argument("--texts", nargs="*", default=None, help="비교할 텍스트 (기본: 검색 메타에서 샘플링)")
+    parser.add_argument("--sample", type=int, default=500)
+    args = parser.parse_args()
+
+    texts = args.texts
+    if not texts:
+        from llm_agent.search import load_index
+        _, meta, _ = load_index()
+        rows = [row for row in meta if row is not None]
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(rows), size=min(args.sample, len(rows)), replace=False)
+        texts = [rows[i][2] for i in picks]
+
+    reference = load_encoder(args.model_path, "fp32")
+    candidate = load_encoder(args.model_path, args.backend)
+    print(check_parity(reference, candidate, texts))
@@ -0,0 +1,66 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import warnings
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from llm_agent.preprocess import infer_header_rows, infer_header_rows_legacy
+from llm_agent.xlsx_reader import HEADER_READ_ROWS
+
+warnings.filterwarnings("ignore")
+
+
+# 엑셀 코퍼스의 모든 시트에서 기존/벡터화 헤더 추론 결과 비교
+def compare_corpus(paths):
+    results = []
+    for path in paths:
+        sheets = pd.read_excel(path, header=None, sheet_name=None)
+        for sheet_name, df_raw in sheets.items():
+            # preprocess_excel_with_variable_header의 병합 셀이 없는 경우와 같이 헤더 구간만 채운 뒤 비교
+            df_raw = df_raw.dropna(axis=1, how="all")
+            df_raw = df_raw.loc[df_raw.first_valid_index():].head(HEADER_READ_ROWS).ffill()
+            if df_raw.empty:
+                continue
+
+            start = time.perf_counter()
+            legacy = infer_header_rows_legacy(df_raw)
+            legacy_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            depth = infer_header_rows(df_raw)
+            new_time = time.perf_counter() - start
+
+            results.append({
+                "file": os.path.basename(path),
+                "sheet": sheet_name,
+                "shape": df_raw.shape,
+                "legacy": legacy,
+                "vectorized": depth,
+                "legacy_time": legacy_time,
+                "vectorized_time": new_time,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="헤더 줄 수 추론 회귀 확인 (기존 구현 대비)")
+    parser.add_argument("xlsx_dir", nargs="?", default="./data/xlsx_data")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.xlsx_dir, "*.xlsx")))
+    results = compare_corpus(paths)
+    mismatches = [r for r in results if r["legacy"] != r["vectorized"]]
+    for r in mismatches:
+        print(f"[MISMATCH] {r['file']} / {r['sheet']}: legacy={r['legacy']}, vectorized={r['vectorized']}")
+
+    legacy_time = sum(r["legacy_time"] for r in results)
+    new_time = sum(r["vectorized_time"] for r in results)
+    print(f"[INFO] 시트 {len(results)}개, 불일치 {len(mismatches)}개")
+    print(f"[INFO] 소요 시간: 기존 {legacy_time:.3f}s, 벡터화 {new_time:.3f}s")
+    sys.exit(1 if mismatches else 0)
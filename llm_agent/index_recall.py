@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import pickle
+import argparse
+import numpy as np
+import faiss
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+
+from llm_agent.encoder import load_encoder
+from llm_agent.meta_store import MetaStore, meta_store_exists
+from llm_agent.search import configure_search_params
+
+
+# 인덱스 + 메타 + (설정 파일 기준) 임베딩 모델 로딩
+def load_index_bundle(index_path, meta_path, model_path=None):
+    index = configure_search_params(faiss.read_index(index_path))
+    if meta_store_exists(meta_path):
+        meta = MetaStore.open(meta_path)
+    else:
+        # 이전 형식(pickle)
+        if not os.path.exists(meta_path):
+            meta_path += ".pkl"
+        with open(meta_path, "rb") as f:
+            meta = pickle.load(f)
+
+    if model_path is None:
+        config_path = os.path.splitext(index_path)[0] + ".json"
+        model_name = "KURE-v1"
+        if os.path.exists(config_path):
+            with open(config_path, encoding="utf-8") as f:
+                model_name = json.load(f).get("model_name", model_name)
+        model_path = os.path.abspath(os.path.join("./llm_agent", os.path.basename(model_name.rstrip("/"))))
+
+    return index, meta, load_encoder(model_path, "fp32")
+
+
+# 쿼리별 top-k 결과를 (파일명, 원문 단어) 집합으로 변환해 id 체계가 달라도 비교 가능하게 함
+def search_rows(index, meta, model, queries, k):
+    vecs = model.encode(queries, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+    start = time.perf_counter()
+    D, I = index.search(vecs, k)
+    elapsed = time.perf_counter() - start
+    results = [[meta[i] for i in row if i >= 0 and meta[i] is not None] for row in I]
+    return results, elapsed / len(queries)
+
+
+def compare_indexes(reference, candidate, queries, k=10):
+    ref_rows, ref_time = search_rows(*reference, queries, k)
+    cand_rows, cand_time = search_rows(*candidate, queries, k)
+
+    word_recall = []
+    file_recall = []
+    for ref, cand in zip(ref_rows, cand_rows):
+        ref_words = {(row[0], row[2]) for row in ref}
+        cand_words = {(row[0], row[2]) for row in cand}
+        ref_files = {row[0] for row in ref}
+        cand_files = {row[0] for row in cand}
+        if ref_words:
+            word_recall.append(len(ref_words & cand_words) / len(ref_words))
+        if ref_files:
+            file_recall.append(len(ref_files & cand_files) / len(ref_files))
+
+    return {
+        "queries": len(queries),
+        f"word_recall@{k}": float(np.mean(word_recall)) if word_recall else None,
+        f"file_recall@{k}": float(np.mean(file_recall)) if file_recall else None,
+        "reference_index_mb": len(faiss.serialize_index(reference[0])) / 2 ** 20,
+        "candidate_index_mb": len(faiss.serialize_index(candidate[0])) / 2 ** 20,
+        "reference_search_ms": ref_time * 1000,
+        "candidate_search_ms": cand_time * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="전체 차원 인덱스 대비 축소/압축 인덱스의 재현율 비교")
+    parser.add_argument("--ref-index", default="./data/faiss/faiss_index.idx")
+    parser.add_argument("--ref-meta", default="./data/faiss/faiss_meta", help="메타 저장소 prefix 또는 pickle 경로")
+    parser.add_argument("--ref-model", default=None)
+    parser.add_argument("--cand-index", required=True)
+    parser.add_argument("--cand-meta", required=True)
+    parser.add_argument("--cand-model", default=None)
+    parser.add_argument("--queries", nargs="*", default=None, help="검색어 (기본: 기준 메타에서 샘플링)")
+    parser.add_argument("--sample", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    reference = load_index_bundle(args.ref_index, args.ref_meta, args.ref_model)
+    candidate = load_index_bundle(args.cand_index, args.cand_meta, args.cand_model)
+
+    queries = args.queries
+    if not queries:
+        rows = [row for row in reference[1] if row is not None]
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(rows), size=min(args.sample, len(rows)), replace=False)
+        queries = [rows[i][1] for i in picks]
+
+    print(compare_indexes(reference, candidate, queries, args.k))
@@ -0,0 +1,122 @@
+import time
+import uuid
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+# 업로드 작업 설정
+UPLOAD_WORKERS = max(1, min(4, (multiprocessing.cpu_count() or 2) - 1))
+MAX_JOBS = 1000   # 메모리에 보관할 작업 수 (넘으면 끝난 작업부터 삭제)
+
+
+# 워커 프로세스에서 실행: 결과와 함께 시작 시각/소요 시간 반환 (풀 대기 시간 구분용)
+def _timed_call(fn, *args):
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+# 업로드 작업 큐: 전처리는 프로세스 풀에서 병렬로, 이후 단계(DB 적재, 인덱스 갱신)는 순서대로 한 스레드에서 실행
+# (작업 상태는 프로세스 메모리에 있으므로 gunicorn 워커는 1개로 운용)
+class UploadJobQueue:
+    def __init__(self, preprocess_fn, finish_fn, max_workers=UPLOAD_WORKERS):
+        self.preprocess_fn = preprocess_fn   # file_path -> csv_path (프로세스 풀에서 실행, pickle 가능해야 함)
+        self.finish_fn = finish_fn           # (job_id, csv_path) -> 결과 dict
+        self.max_workers = max_workers
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self._finisher = ThreadPoolExecutor(max_workers=1)
+
+    # torch/faiss를 로딩한 부모 프로세스를 fork하지 않도록 spawn 사용, 첫 작업 때 생성
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    # 워커가 죽으면(메모리 부족 등) 풀은 다시 쓸 수 없으므로 버리고 다음 작업 때 새로 생성
+    def _discard_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, file_path, filename):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "filename": filename,
+                "status": "preprocessing",
+                "error": None,
+                "result": None,
+                "created": now,
+                "updated": now,
+                "timings": {},
+            }
+            self._trim()
+
+        pool = None
+        try:
+            pool = self._get_pool()
+            future = pool.submit(_timed_call, self.preprocess_fn, file_path)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
+            print(f"[ERROR] 업로드 작업 등록 실패: {filename}, 이유: {e}")
+            self.update(job_id, status="failed", error=f"작업 등록 실패: {e}")
+            return job_id
+        future.add_done_callback(lambda f: self._finisher.submit(self._finish, job_id, f, pool))
+        return job_id
+
+    def _finish(self, job_id, future, pool):
+        job = self.get(job_id)
+        try:
+            csv_path, started, elapsed = future.result()
+            self._record_timing(job_id, "queue", started - job["created"])
+            self._record_timing(job_id, "preprocess", elapsed)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._discard_pool(pool)
+            print(f"[ERROR] 업로드 전처리 실패: {job['filename']}, 이유: {e}")
+            self.update(job_id, status="failed", error=f"전처리 실패: {e}")
+            return
+
+        start = time.time()
+        try:
+            result = self.finish_fn(job_id, csv_path)
+        except Exception as e:
+            print(f"[ERROR] 업로드 후처리 실패: {job['filename']}, 이유: {e}")
+            self.update(job_id, status="failed", error=str(e), result={"csv_path": csv_path})
+            return
+        self._record_timing(job_id, "finish", time.time() - start)
+        self.update(job_id, status="done", result=result)
+
+    def _record_timing(self, job_id, step, seconds):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["timings"][step] = seconds
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields, updated=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job, timings=dict(job["timings"]))
+
+    def list(self):
+        with self._lock:
+            return [dict(job, timings=dict(job["timings"])) for job in self._jobs.values()]
+
+    def _trim(self):
+        finished = [k for k, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        while len(self._jobs) > MAX_JOBS and finished:
+            del self._jobs[finished.pop(0)]
@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import pickle
+import numpy as np
+
+
+# 컬럼형 메타 저장소 파일 구성 (prefix 뒤에 붙는 확장자)
+#   .files.json   : 파일명 목록 (file id → 파일명)
+#   .file_ids.npy : 행별 file id (int32, 삭제된 행은 -1)
+#   .offsets.npy  : 문자열 경계 (int64, 행 i의 word_norm = [2i, 2i+1), word_raw = [2i+1, 2i+2))
+#   .strings.bin  : UTF-8 문자열 blob
+SUFFIXES = {
+    "files": ".files.json",
+    "file_ids": ".file_ids.npy",
+    "offsets": ".offsets.npy",
+    "strings": ".strings.bin",
+}
+
+
+def meta_store_exists(prefix):
+    return all(os.path.exists(prefix + suffix) for suffix in SUFFIXES.values())
+
+
+# (file_name, word_norm, word_raw) 행을 메모리 매핑된 배열로 보관하고, 조회한 행만 디코딩
+class MetaStore:
+    def __init__(self, file_names, file_ids, offsets, strings):
+        self.file_names = list(file_names)
+        self._file_lookup = {name: i for i, name in enumerate(self.file_names)}
+        self._file_ids = file_ids
+        self._offsets = offsets
+        self._strings = strings
+        self._base_len = len(file_ids)
+        self._removed = set()
+        self._appended = []
+        self._prefix = None  # open()으로 연 저장소 위치 (같은 곳에 저장하면 문자열 blob 뒤에 추가분만 기록)
+
+    @classmethod
+    def open(cls, prefix):
+        with open(prefix + SUFFIXES["files"], encoding="utf-8") as f:
+            file_names = json.load(f)
+        file_ids = np.load(prefix + SUFFIXES["file_ids"], mmap_mode="r")
+        offsets = np.load(prefix + SUFFIXES["offsets"], mmap_mode="r")
+        strings_path = prefix + SUFFIXES["strings"]
+        if os.path.getsize(strings_path) > 0:
+            strings = np.memmap(strings_path, dtype=np.uint8, mode="r")
+        else:
+            strings = np.zeros(0, dtype=np.uint8)
+        store = cls(file_names, file_ids, offsets, strings)
+        store._prefix = os.path.abspath(prefix)
+        return store
+
+    @classmethod
+    def from_rows(cls, rows):
+        store = cls([], np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint8))
+        store.extend(rows)
+        return store
+
+    def __len__(self):
+        return self._base_len + len(self._appended)
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if i >= self._base_len:
+            return self._appended[i - self._base_len]
+        if i in self._removed:
+            return None
+        file_id = int(self._file_ids[i])
+        if file_id < 0:
+            return None
+        start, mid, end = (int(v) for v in self._offsets[2 * i:2 * i + 3])
+        word_norm = self._strings[start:mid].tobytes().decode("utf-8")
+        word_raw = self._strings[mid:end].tobytes().decode("utf-8")
+        return self.file_names[file_id], word_norm, word_raw
+
+    # 행 삭제만 지원 (meta[i] = None)
+    def __setitem__(self, i, value):
+        if value is not None:
+            raise ValueError("MetaStore는 행 삭제(None 대입)만 지원합니다.")
+        i = int(i)
+        if i >= self._base_len:
+            self._appended[i - self._base_len] = None
+        else:
+            self._removed.add(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, rows):
+        self._appended.extend(rows)
+
+    def copy(self):
+        store = MetaStore(self.file_names, self._file_ids, self._offsets, self._strings)
+        store._removed = set(self._removed)
+        store._appended = list(self._appended)
+        store._prefix = self._prefix
+        return store
+
+    # 삭제 표시된 기존 행 id
+    def removed_ids(self):
+        return set(self._removed)
+
+    # 특정 파일의 행 번호 (문자열 디코딩 없이 file id로 조회)
+    def row_ids_for_file(self, file_name):
+        ids = []
+        file_id = self._file_lookup.get(file_name)
+        if file_id is not None:
+            ids = [i for i in np.flatnonzero(np.asarray(self._file_ids) == file_id).tolist() if i not in self._removed]
+        ids.extend(
+            self._base_len + j for j, row in enumerate(self._appended) if row is not None and row[0] == file_name
+        )
+        return ids
+
+    # 삭제되지 않은 행이 있는 파일명 목록
+    def live_file_names(self):
+        live_ids = np.asarray(self._file_ids).copy()
+        if self._removed:
+            live_ids[list(self._removed)] = -1
+        names = [self.file_names[i] for i in np.unique(live_ids[live_ids >= 0]).tolist()]
+        names.extend(row[0] for row in self._appended if row is not None)
+        return list(dict.fromkeys(names))
+
+    def save(self, prefix):
+        file_names = list(self.file_names)
+        file_lookup = dict(self._file_lookup)
+
+        file_ids = np.array(self._file_ids, dtype=np.int32)
+        if self._removed:
+            file_ids[list(self._removed)] = -1
+        offsets = [np.array(self._offsets, dtype=np.int64)]
+
+        # 연 위치에 그대로 저장하고 blob이 그 사이 바뀌지 않았으면 추가분만 파일 끝에 기록, 아니면 blob 전체를 새로 씀
+        strings_path = prefix + SUFFIXES["strings"]
+        append = (
+            self._prefix == os.path.abspath(prefix)
+            and os.path.exists(strings_path)
+            and os.path.getsize(strings_path) == len(self._strings)
+        )
+        chunks = [] if append else [np.asarray(self._strings).tobytes()]
+
+        # 추가된 행은 기존 blob 뒤에 이어 붙임
+        new_ids = []
+        new_offsets = []
+        pos = len(self._strings)
+        for row in self._appended:
+            if row is None:
+                new_ids.append(-1)
+                encoded = (b"", b"")
+            else:
+                file_name, word_norm, word_raw = row
+                if file_name not in file_lookup:
+                    file_lookup[file_name] = len(file_names)
+                    file_names.append(file_name)
+                new_ids.append(file_lookup[file_name])
+                encoded = (word_norm.encode("utf-8"), word_raw.encode("utf-8"))
+            for b in encoded:
+                chunks.append(b)
+                pos += len(b)
+                new_offsets.append(pos)
+
+        file_ids = np.concatenate([file_ids, np.array(new_ids, dtype=np.int32)])
+        offsets = np.concatenate(offsets + [np.array(new_offsets, dtype=np.int64)])
+
+        # 임시 파일에 쓴 뒤 교체 (파일명 목록을 마지막에 교체)
+        # (blob 추가는 기존 offsets가 가리키는 범위를 건드리지 않으므로 읽는 쪽에 안전)
+        tmp = {key: prefix + suffix + ".tmp" for key, suffix in SUFFIXES.items()}
+        with open(strings_path if append else tmp["strings"], "ab" if append else "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        with open(tmp["file_ids"], "wb") as f:
+            np.save(f, file_ids)
+        with open(tmp["offsets"], "wb") as f:
+            np.save(f, offsets)
+        with open(tmp["files"], "w", encoding="utf-8") as f:
+            json.dump(file_names, f, ensure_ascii=False)
+        for key in ("strings", "offsets", "file_ids", "files"):
+            if key == "strings" and append:
+                continue
+            os.replace(tmp[key], prefix + SUFFIXES[key])
+
+
+def write_meta_store(rows, prefix):
+    MetaStore.from_rows(rows).save(prefix)
+
+
+# 기존 faiss_meta.pkl → 컬럼형 저장소 변환
+if __name__ == "__main__":
+    pkl_path = sys.argv[1] if len(sys.argv) > 1 else "./data/faiss/faiss_meta.pkl"
+    prefix = os.path.splitext(pkl_path)[0]
+    with open(pkl_path, "rb") as f:
+        rows = pickle.load(f)
+    write_meta_store(rows, prefix)
+    print(f"[INFO] 메타 저장소 변환 완료: {prefix}.* ({len(rows)}행)")
@@ -0,0 +1,216 @@
+import os
+import json
+from functools import reduce
+import numpy as np
+
+
+# 메타 행 n-gram 역색인 파일 구성 (prefix 뒤에 붙는 확장자)
+#   .json         : {"max_n", "rows"} (rows: 색인한 메타 행 수, 메타와 다르면 다시 생성)
+#   .keys.npy     : 정렬된 n-gram 코드 (int64)
+#   .offsets.npy  : 코드별 posting 경계 (int64, keys[k]의 posting = postings[offsets[k]:offsets[k+1]])
+#   .postings.npy : 메타 행 id (int32, 코드별로 오름차순)
+SUFFIXES = {
+    "info": ".json",
+    "keys": ".keys.npy",
+    "offsets": ".offsets.npy",
+    "postings": ".postings.npy",
+}
+NGRAM_MAX_N = 2
+_CODE_BASE = 0x110000  # 유니코드 코드 포인트 범위
+
+
+# 문자 n-gram 추출 함수
+def char_ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+# n-gram → 정수 코드 (1-gram은 코드 포인트, 2-gram은 그보다 큰 값)
+def gram_code(gram):
+    if len(gram) == 1:
+        return ord(gram)
+    return (ord(gram[0]) + 1) * _CODE_BASE + ord(gram[1])
+
+
+def text_gram_codes(text, max_n=NGRAM_MAX_N):
+    return {gram_code(gram) for n in range(1, max_n + 1) for gram in char_ngrams(text, n)}
+
+
+def ngram_index_exists(prefix):
+    return all(os.path.exists(prefix + suffix) for suffix in SUFFIXES.values())
+
+
+# 문자 n-gram 역색인 (부분 문자열 후보를 posting list 교집합으로 조회, 파일명처럼 작은 목록용)
+class NgramIndex:
+    def __init__(self, texts, max_n=NGRAM_MAX_N):
+        self.max_n = max_n
+        self.texts = list(texts)
+
+        postings = {}
+        for i, text in enumerate(self.texts):
+            for n in range(1, max_n + 1):
+                for gram in char_ngrams(text, n):
+                    postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def lookup(self, query, exclude_exact=True):
+        if not query:
+            return []
+
+        n = min(self.max_n, len(query))
+        lists = []
+        for gram in char_ngrams(query, n):
+            ids = self.postings.get(gram)
+            if ids is None:
+                return []
+            lists.append(ids)
+
+        # 짧은 posting list부터 교집합
+        lists.sort(key=len)
+        candidates = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists)
+
+        # n-gram 교집합은 필요조건이므로 실제 포함 여부 확인
+        hits = []
+        for i in candidates.tolist():
+            text = self.texts[i]
+            if query in text and not (exclude_exact and query == text):
+                hits.append(i)
+        return hits
+
+
+# 메타 행(word_norm) n-gram 역색인: posting list만 메모리 매핑 배열로 보관하고 문자열은 복사하지 않음
+# (후보 확인 시 메타 저장소에서 해당 행만 디코딩, 증분 추가분은 저장 전까지 메모리에 보관)
+class RowNgramIndex:
+    def __init__(self, keys, offsets, postings, rows, max_n=NGRAM_MAX_N, delta=None):
+        self.max_n = max_n
+        self.rows = rows  # 색인한 메타 행 수
+        self._keys = keys
+        self._offsets = offsets
+        self._postings = postings
+        self._delta = delta or {}  # n-gram 코드 → 추가된 행 id 목록
+
+    @classmethod
+    def open(cls, prefix):
+        with open(prefix + SUFFIXES["info"], encoding="utf-8") as f:
+            info = json.load(f)
+        arrays = [np.load(prefix + SUFFIXES[key], mmap_mode="r") for key in ("keys", "offsets", "postings")]
+        return cls(*arrays, info["rows"], info["max_n"])
+
+    # 행 id 순서의 word_norm 목록으로 생성 (삭제된 행은 None)
+    @classmethod
+    def build(cls, word_norms, max_n=NGRAM_MAX_N):
+        codes = []
+        ids = []
+        for i, text in enumerate(word_norms):
+            if text is None:
+                continue
+            grams = text_gram_codes(text, max_n)
+            codes.extend(grams)
+            ids.extend([i] * len(grams))
+        return cls._from_pairs(np.array(codes, dtype=np.int64), np.array(ids, dtype=np.int32),
+                               len(word_norms), max_n)
+
+    @classmethod
+    def _from_pairs(cls, codes, ids, rows, max_n):
+        order = np.lexsort((ids, codes))
+        codes, ids = codes[order], ids[order]
+        keys, starts = np.unique(codes, return_index=True)
+        offsets = np.append(starts, len(codes)).astype(np.int64)
+        return cls(keys, offsets, ids, rows, max_n)
+
+    def __len__(self):
+        return self.rows
+
+    # start_id부터 이어지는 새 행들을 추가한 역색인 (기존 배열은 공유, 새 행의 posting만 계산)
+    def with_rows(self, start_id, word_norms):
+        delta = {code: list(ids) for code, ids in self._delta.items()}
+        for i, text in enumerate(word_norms, start_id):
+            for code in text_gram_codes(text, self.max_n):
+                delta.setdefault(code, []).append(i)
+        rows = max(self.rows, start_id + len(word_norms))
+        return RowNgramIndex(self._keys, self._offsets, self._postings, rows, self.max_n, delta)
+
+    def _posting(self, code):
+        k = int(np.searchsorted(self._keys, code))
+        base = None
+        if k < len(self._keys) and self._keys[k] == code:
+            base = np.asarray(self._postings[self._offsets[k]:self._offsets[k + 1]])
+        added = self._delta.get(code)
+        if added is None:
+            return base
+        added = np.array(added, dtype=np.int32)
+        return added if base is None else np.concatenate([base, added])
+
+    # n-gram 교집합 후보 행 id
+    def candidates(self, query):
+        n = min(self.max_n, len(query))
+        lists = []
+        for gram in char_ngrams(query, n):
+            ids = self._posting(gram_code(gram))
+            if ids is None:
+                return np.zeros(0, dtype=np.int32)
+            lists.append(ids)
+        lists.sort(key=len)
+        return reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists)
+
+    # 부분 포함 행 id (meta[i]가 None인 삭제된 행은 무시)
+    def lookup(self, query, meta, exclude_exact=True):
+        if not query:
+            return []
+        hits = []
+        for i in self.candidates(query).tolist():
+            row = meta[i]
+            if row is None:
+                continue
+            word_norm = row[1]
+            if query in word_norm and not (exclude_exact and query == word_norm):
+                hits.append(i)
+        return hits
+
+    # 추가분을 합쳐(removed 행은 제외) 임시 파일에 쓴 뒤 교체 (info를 마지막에 교체)
+    def save(self, prefix, removed=None):
+        index = self
+        if self._delta or removed:
+            counts = np.diff(np.asarray(self._offsets))
+            codes = [np.repeat(np.asarray(self._keys), counts)]
+            ids = [np.asarray(self._postings)]
+            for code, added in self._delta.items():
+                codes.append(np.full(len(added), code, dtype=np.int64))
+                ids.append(np.array(added, dtype=np.int32))
+            codes, ids = np.concatenate(codes), np.concatenate(ids)
+            if removed:
+                keep = ~np.isin(ids, np.fromiter(removed, dtype=np.int32))
+                codes, ids = codes[keep], ids[keep]
+            index = RowNgramIndex._from_pairs(codes, ids, self.rows, self.max_n)
+
+        tmp = {key: prefix + suffix + ".tmp" for key, suffix in SUFFIXES.items()}
+        for key, values in (("keys", index._keys), ("offsets", index._offsets), ("postings", index._postings)):
+            with open(tmp[key], "wb") as f:
+                np.save(f, np.asarray(values))
+        with open(tmp["info"], "w", encoding="utf-8") as f:
+            json.dump({"max_n": self.max_n, "rows": self.rows}, f)
+        for key in ("keys", "offsets", "postings", "info"):
+            os.replace(tmp[key], prefix + SUFFIXES[key])
+
+
+# 테이블명 부분 포함 검색용 인덱스 생성 (메타 행 역색인은 따로 로딩/생성해 전달)
+def build_partial_match_index(file_token_index, word_index, max_n=NGRAM_MAX_N):
+    file_names = []
+    file_tokens = []
+    for file_name, tokens in file_token_index.items():
+        for token in tokens:
+            file_names.append(file_name)
+            file_tokens.append(token)
+
+    return {
+        "file_names": file_names,
+        "files": NgramIndex(file_tokens, max_n),
+        "words": word_index,
+    }
+
+
+# 부분 포함 매칭: (매칭된 파일 목록, 매칭된 메타 행 id 집합)
+def find_partial_matches(partial_index, query_norm, meta):
+    file_names = partial_index["file_names"]
+    matched_files = list(dict.fromkeys(file_names[i] for i in partial_index["files"].lookup(query_norm)))
+    matched_words = set(partial_index["words"].lookup(query_norm, meta))
+    return matched_files, matched_words
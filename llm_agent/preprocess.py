@@ -1,12 +1,84 @@
 import pandas as pd
+import numpy as np
 import glob
 import os
+import re
 import warnings
+from llm_agent.xlsx_reader import HEADER_READ_ROWS, read_sheet_split, read_merged_ranges, restore_numeric_columns
 
 warnings.filterwarnings("ignore")
 
 
-def infer_header_rows(df):
+# 헤더 추론 시 한 번에 검사하는 행 수 (헤더가 더 길면 다음 구간을 이어서 검사)
+HEADER_SCAN_WINDOW = 32
+
+
+# 행 방향(왼쪽 → 오른쪽) forward fill
+def _ffill_rows(values):
+    valid = pd.notna(values)
+    idx = np.where(valid, np.arange(values.shape[1]), 0)
+    np.maximum.accumulate(idx, axis=1, out=idx)
+    filled = np.take_along_axis(values, idx, axis=1)
+    return np.where(np.logical_or.accumulate(valid, axis=1), filled, np.nan)
+
+
+# 열 방향(위 → 아래) forward fill
+def _ffill_cols(values):
+    return _ffill_rows(values.T).T
+
+
+# 이웃한 열끼리 값이 같은지 (둘 다 값이 있을 때만)
+def _adjacent_equal(values):
+    valid = pd.notna(values)
+    both = valid[:, :-1] & valid[:, 1:]
+    equal = np.zeros(both.shape, dtype=bool)
+    np.equal(values[:, :-1], values[:, 1:], out=equal, where=both)
+    return equal
+
+
+# mask 위치 중 값이 ""/"-"가 아닌 곳
+def _not_blank(values, mask):
+    result = mask.copy()
+    for blank in ("", "-"):
+        same = np.zeros(mask.shape, dtype=bool)
+        np.equal(values, blank, out=same, where=mask)
+        result &= ~same
+    return result
+
+
+# 헤더 줄 수 추론 (infer_header_rows_legacy와 같은 결과를 행 단위 반복 없이 계산)
+#   rows      : 각 행을 가로로 채운 값 (검사 대상 행)
+#   prev_rows : 윗줄들을 세로로 채운 뒤 다시 가로로 채운 값 (비교 대상 윗줄)
+def infer_header_rows(df, window=HEADER_SCAN_WINDOW):
+    values = df.to_numpy(dtype=object)
+
+    depth = 1  # 규칙 1: 최소 1개는 헤더로 간주
+    carry = None  # 이전 구간 마지막 행 (세로 forward fill 상태)
+    for start in range(0, len(values), window):
+        rows = _ffill_rows(values[start:start + window])
+        filled = _ffill_cols(rows if carry is None else np.vstack([carry[None, :], rows]))
+        prev_rows = _ffill_rows(filled)
+
+        repeated = _not_blank(rows[:, :-1], _adjacent_equal(rows))
+        prev_equal = _adjacent_equal(prev_rows[:-1])
+        if start == 0:
+            # 규칙 2: 첫 번째 행에 같은 값이 이웃하면 최소 2개
+            if repeated[0].any():
+                depth = 2
+            repeated = repeated[1:]
+
+        # 규칙 3: 같은 위치에서 윗줄도 반복되는 행이 이어지는 동안 추가, 처음 깨지는 행에서 중단
+        checks = (repeated & prev_equal).any(axis=1)
+        stop = np.flatnonzero(~checks)
+        if len(stop):
+            return depth + int(stop[0])
+        depth += len(checks)
+        carry = filled[-1]
+
+    return depth
+
+
+def infer_header_rows_legacy(df):
     df_copy = df.copy()
     max_depth = len(df_copy)
     depth = 1  # 규칙 1: 최소 1개는 헤더로 간주
@@ -47,29 +119,73 @@ def infer_header_rows(df):
     return depth
 
 
-def preprocess_excel_with_variable_header(file_path):
-    # Step 1: 파일 전체 불러오기
-    df_raw = pd.read_excel(file_path, header=None)
-
-    # Step 1.5: 모든 값이 NA인 열 제거
+# 병합 셀 범위로 헤더 줄 수 계산 (top: 헤더 첫 행 위치, 그 행에서 시작하는 병합이 없으면 None)
+#   세로 병합은 끝 행까지, 가로 병합은 아래에 하위 헤더가 있으므로 다음 행까지 헤더로 보고,
+#   늘어난 헤더 구간 안에서 시작하는 병합이 있으면 이어서 확장
+def header_rows_from_merges(merged, columns, top=0):
+    columns = set(columns)
+    depth = 0
+    for r0, c0, r1, c1 in sorted(merged):
+        if r0 < top:
+            continue
+        if r0 - top >= max(depth, 1):
+            break
+        if not any(c in columns for c in range(c0, c1 + 1)):
+            continue
+        depth = max(depth, r1 - top + 1, r0 - top + 2 if c1 > c0 else 0)
+    return depth or None
+
+
+# 병합 셀에 왼쪽 위 셀 값 채우기 (헤더/본문 모두, 병합 범위가 걸친 열만 수정)
+# df의 index/columns는 시트의 행/열 위치 (위쪽 빈 행만 잘라낸 연속된 행)
+def fill_merged_cells(df, merged):
+    top = df.index[0]
+    filled = {}
+    for r0, c0, r1, c1 in merged:
+        if not 0 <= r0 - top < len(df) or c0 not in df.columns:
+            continue
+        for col in range(c0, c1 + 1):
+            if col in df.columns and col not in filled:
+                filled[col] = df[col].to_numpy(dtype=object, copy=True)
+        value = filled[c0][r0 - top]
+        for col in range(c0, c1 + 1):
+            if col in filled:
+                filled[col][r0 - top:r1 - top + 1] = value
+    for col, values in filled.items():
+        df[col] = values
+    return df
+
+
+def preprocess_excel_with_variable_header(file_path, engine=None, sheet_name=0):
+    # Step 1: 헤더 구간을 먼저, 본문은 한 번에 읽기 (엔진은 xlsx_reader.XLSX_ENGINE)
+    df_head, df_body = read_sheet_split(file_path, sheet_name, engine=engine)
+    df_raw = pd.concat([df_head, df_body], ignore_index=True)
+
+    # Step 1.5: 모든 값이 NA인 열과 시트 위쪽의 빈 행 제거 (행/열 위치는 시트 기준 그대로 유지)
     df_raw = df_raw.dropna(axis=1, how="all")
+    if df_raw.empty:
+        return pd.DataFrame()
+    df_raw = df_raw.loc[df_raw.first_valid_index():].copy()
 
-    # Step 2: 병합된 셀 보정
-    df_raw = df_raw.ffill()
+    # Step 2: 병합된 셀 복원 (시트 전체 ffill 대신 병합 범위만 왼쪽 위 값으로 채움, 본문의 세로 병합 포함)
+    merged = read_merged_ranges(file_path, sheet_name)
+    df_raw = restore_numeric_columns(fill_merged_cells(df_raw, merged))
 
-    # Step 3: 헤더 줄 수 추론
-    inferred_header_rows = infer_header_rows(df_raw)
+    # Step 3: 헤더 줄 수 (병합 셀 정보 우선, 병합이 없으면 헤더 구간만 채워서 추론)
+    inferred_header_rows = header_rows_from_merges(merged, df_raw.columns, top=df_raw.index[0])
+    if inferred_header_rows is None:
+        inferred_header_rows = infer_header_rows(df_raw.iloc[:HEADER_READ_ROWS].ffill())
 
-    df_raw.iloc[:inferred_header_rows] = df_raw.iloc[:inferred_header_rows].ffill(axis=1)
+    # 헤더 구간의 병합되지 않은 빈칸은 위/왼쪽 값으로 채움 (본문은 그대로)
+    header_df = df_raw.iloc[:inferred_header_rows].ffill().ffill(axis=1)
 
     # Step 4: 헤더 생성
     data_start_row = inferred_header_rows
     if inferred_header_rows == 1:
         # 단일 헤더
-        headers = df_raw.iloc[0]
+        headers = header_df.iloc[0]
     else:
         # 다중 헤더 → 문자열 결합
-        header_df = df_raw.iloc[0:inferred_header_rows]
         combined = header_df.astype(str).apply(lambda x: "_".join(x), axis=0)
 
         def remove_redundant_prefix(header):
@@ -94,45 +210,25 @@ def preprocess_excel_with_variable_header(file_path):
     return df_data
 
 
-def data_save(df, load_path, save_path='./data/csv_data'):
-    data_save_path = save_path + '/' + load_path.split('/')[-1][:-5] + '.csv'
+# sheet_name을 주면 "파일명_시트명.csv"로 저장 (시트가 여러 개인 워크북)
+def data_save(df, load_path, save_path='./data/csv_data', sheet_name=None):
+    file_name = load_path.split('/')[-1][:-5]
+    if sheet_name is not None:
+        file_name += '_' + re.sub(r'[\\/:*?"<>|\s]+', '_', str(sheet_name))
+    data_save_path = save_path + '/' + file_name + '.csv'
     df.to_csv(data_save_path, index = False)
+    return data_save_path
 
 
-
-# def preprocess_run(file_path):
-#     load_path = os.path.abspath('../data/xlsx_data')
-#     save_path = os.path.abspath('../data/csv_data')
-#     xlsx_path = glob.glob(os.path.join(load_path, "*.xlsx"))
-
-#     print(f"[DEBUG] 대상 엑셀 파일: {xlsx_path}")
-
-#     # a = 0
-#     # for xp in xlsx_path:
-#     #     df = preprocess_excel_with_variable_header(xp)
-#     #     data_save(df, xp, save_path)
-#     #     a += 1
-#     # print(a)
-
-#     count = 0
-#     for xp in xlsx_path:
-#         try:
-#             df = preprocess_excel_with_variable_header(xp)
-#             data_save(df, xp, save_path)
-#             count += 1
-#         except Exception as e:
-#             print(f"[ERROR] 파일 처리 실패: {xp}, 이유: {e}")
-
-#     print(f"[INFO] 총 {count}개 파일 저장 완료")
-
 def preprocess_run(file_path):
     save_path = os.path.abspath('./data/csv_data')
     os.makedirs(save_path, exist_ok=True)
 
     try:
         df = preprocess_excel_with_variable_header(file_path)
-        data_save(df, file_path, save_path)
+        csv_path = data_save(df, file_path, save_path)
         print(f"[INFO] 파일 처리 및 저장 완료")
+        return csv_path
     except Exception as e:
         print(f"[ERROR] 파일 처리 실패: {file_path}, 이유: {e}")
         raise
\ No newline at end of file
@@ -0,0 +1,131 @@
+import os
+import re
+import glob
+import hashlib
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+
+# 쿼리 결과 캐시 설정
+RESULT_CACHE_MEMORY_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_DISK_BYTES = 1024 * 1024 * 1024
+
+
+# 문자열/식별자 따옴표 밖의 공백을 정리하고 소문자화 (SQLite 키워드·비인용 식별자는 대소문자 무시)
+def normalize_sql(sql):
+    parts = re.split(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""", sql.strip().rstrip(";"))
+    return "".join(p if i % 2 else re.sub(r"\s+", " ", p).lower() for i, p in enumerate(parts)).strip()
+
+
+# SQL 텍스트에 등장하는 테이블만 버전 키에 포함
+def referenced_tables(sql, table_versions):
+    return {t: v for t, v in table_versions.items() if t in sql}
+
+
+# 정규화된 SQL + 테이블별 데이터 버전을 키로 하는 DataFrame 캐시 (메모리 LRU + Parquet 디스크 계층)
+class QueryResultCache:
+    def __init__(self, cache_dir=None, max_memory_bytes=RESULT_CACHE_MEMORY_BYTES, max_disk_bytes=RESULT_CACHE_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()   # key -> (DataFrame, nbytes, tables)
+        self._memory_bytes = 0
+        self._disk_tables = {}         # key -> tables (이 프로세스에서 기록한 파일)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "invalidated": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, sql, table_versions):
+        versions = "|".join(f"{t}={v}" for t, v in sorted(table_versions.items()))
+        return hashlib.sha1(f"{normalize_sql(sql)}\0{versions}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, sql, table_versions):
+        key = self.key(sql, table_versions)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[0].copy()
+
+            if self.cache_dir and os.path.exists(self._path(key)):
+                try:
+                    df = pd.read_parquet(self._path(key))
+                except Exception as e:
+                    print(f"[WARN] 결과 캐시 파일 읽기 실패: {e}")
+                else:
+                    os.utime(self._path(key))  # 디스크 LRU 기준 시각 갱신
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    self._put_memory(key, df, tuple(table_versions))
+                    return df.copy()
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, sql, table_versions, df):
+        key = self.key(sql, table_versions)
+        tables = tuple(table_versions)
+        with self._lock:
+            self._put_memory(key, df.copy(), tables)
+            if self.cache_dir:
+                try:
+                    tmp_path = self._path(key) + ".tmp"
+                    df.to_parquet(tmp_path, index=False)
+                    os.replace(tmp_path, self._path(key))
+                    self._disk_tables[key] = tables
+                    self._evict_disk()
+                except Exception as e:
+                    # 중복 컬럼명 등 Parquet로 저장할 수 없는 결과는 메모리에만 보관
+                    print(f"[WARN] 결과 캐시 파일 저장 실패: {e}")
+
+    def _put_memory(self, key, df, tables):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key)[1]
+        self._memory[key] = (df, nbytes, tables)
+        self._memory_bytes += nbytes
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, size, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= size
+            self._stats["evictions"] += 1
+
+    # 디스크 용량을 넘으면 오래 사용하지 않은 파일부터 삭제
+    def _evict_disk(self):
+        files = [(os.path.getmtime(p), os.path.getsize(p), p) for p in glob.glob(os.path.join(self.cache_dir, "*.parquet"))]
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            self._disk_tables.pop(os.path.basename(path)[:-len(".parquet")], None)
+            total -= size
+            self._stats["evictions"] += 1
+
+    # 테이블이 다시 적재되면 해당 테이블을 참조하는 결과 삭제 (버전이 키에 포함되어 있어 남아 있어도 조회되지 않음)
+    def invalidate_table(self, table_name):
+        with self._lock:
+            for key in [k for k, entry in self._memory.items() if table_name in entry[2]]:
+                self._memory_bytes -= self._memory.pop(key)[1]
+                self._stats["invalidated"] += 1
+            for key in [k for k, tables in self._disk_tables.items() if table_name in tables]:
+                del self._disk_tables[key]
+                if os.path.exists(self._path(key)):
+                    os.remove(self._path(key))
+                    self._stats["invalidated"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else None
+        return stats
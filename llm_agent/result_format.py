@@ -0,0 +1,55 @@
+# 보고서 프롬프트용 결과 직렬화 설정
+RESULT_TOKEN_BUDGET = 3000   # 결과 표 전체 토큰 상한
+RESULT_MAX_ROWS = 200        # 결과 하나당 최대 행 수 (넘으면 앞부분 + 요약 통계)
+RESULT_MIN_ROWS = 10         # 토큰 예산을 맞추기 위해 줄일 수 있는 최소 행 수
+FLOAT_DIGITS = 4
+
+
+# 값이 모두 비어 있는 컬럼 제거, 실수 반올림 (정수 값만 있는 실수 컬럼은 정수로)
+def compact_frame(df, digits=FLOAT_DIGITS):
+    empty = df.isna() | df.eq("")
+    df = df.loc[:, ~empty.all()].copy()
+    for col in df.select_dtypes(include="float").columns:
+        values = df[col].dropna()
+        if len(values) and (values == values.round()).all():
+            df[col] = df[col].astype("Int64")
+        else:
+            df[col] = df[col].round(digits)
+    return df
+
+
+# 숫자 컬럼 요약 통계 (행 수가 많아 일부만 보낼 때 사용)
+def summarize_frame(df, digits=FLOAT_DIGITS):
+    numeric = df.select_dtypes(include="number")
+    if numeric.empty:
+        return ""
+    summary = numeric.agg(["count", "min", "max", "mean", "sum"]).T.round(digits)
+    return summary.to_csv()
+
+
+def format_result(query, df, index, max_rows):
+    total = len(df)
+    lines = [f"[결과 {index}] {query}"]
+    if total > max_rows:
+        lines.append(f"(전체 {total}행 중 앞 {max_rows}행)")
+        lines.append(df.head(max_rows).to_csv(index=False).strip())
+        summary = summarize_frame(df)
+        if summary:
+            lines.append("[전체 요약 통계]")
+            lines.append(summary.strip())
+    else:
+        lines.append(df.to_csv(index=False).strip())
+    return "\n".join(lines)
+
+
+# 쿼리 결과 목록({"query", "dataframe"})을 CSV 텍스트로 직렬화하고, 토큰 예산을 넘으면 행 수를 줄임
+def serialize_results(df_result, token_budget=RESULT_TOKEN_BUDGET, count_tokens=len,
+                      max_rows=RESULT_MAX_ROWS, min_rows=RESULT_MIN_ROWS):
+    frames = [(r["query"], compact_frame(r["dataframe"])) for r in df_result]
+
+    while True:
+        text = "\n\n".join(format_result(q, df, i + 1, max_rows) for i, (q, df) in enumerate(frames))
+        longest = max((len(df) for _, df in frames), default=0)
+        if count_tokens(text) <= token_budget or max_rows <= min_rows or longest <= min_rows:
+            return text
+        max_rows = max(min_rows, min(max_rows, longest) // 2)
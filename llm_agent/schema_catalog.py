@@ -0,0 +1,304 @@
+import os
+import glob
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+import pandas as pd
+
+
+# 요약 설정
+MAX_DISTINCT_VALUES = 200   # TEXT 컬럼 가능한 값 목록 상한 (넘으면 빈도 상위 값만 표본으로 사용)
+NUMERIC_TYPES = ["INTEGER", "REAL", "FLOAT", "NUMERIC", "DOUBLE"]
+CATALOG_TABLE = "_schema_catalog"
+
+# 카탈로그 갱신 확인 주기 (그 사이에는 저장된 버전 스냅샷을 그대로 사용)
+CATALOG_CHECK_INTERVAL = 5    # 초, CSV 폴더 수정 시각 확인 (파일 추가/삭제/교체 감지)
+CATALOG_RESCAN_INTERVAL = 60  # 초, CSV 전체 stat (같은 이름으로 덮어쓴 파일 감지)
+
+
+# 테이블 요약을 SQLite 집계(DISTINCT/MIN/MAX/COUNT)로 계산 (테이블 전체를 pandas로 읽지 않음)
+def summarize_table(conn, table_name, max_values=MAX_DISTINCT_VALUES):
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info('{table_name}')")
+    schema_rows = cursor.fetchall()
+
+    columns = []
+    for row in schema_rows:
+        col_name = row[1]
+        col_type = row[2].upper()
+        col = f'"{col_name}"'
+        column = {"name": col_name, "type": col_type}
+
+        if col_type == "TEXT":
+            distinct = cursor.execute(f'SELECT COUNT(DISTINCT {col}) FROM "{table_name}"').fetchone()[0]
+            if distinct <= max_values:
+                values = cursor.execute(
+                    f'SELECT DISTINCT CAST({col} AS TEXT) FROM "{table_name}" WHERE {col} IS NOT NULL'
+                ).fetchall()
+            else:
+                values = cursor.execute(
+                    f'SELECT CAST({col} AS TEXT) FROM "{table_name}" WHERE {col} IS NOT NULL '
+                    f'GROUP BY {col} ORDER BY COUNT(*) DESC, {col} LIMIT ?', (max_values,)
+                ).fetchall()
+            column["values"] = sorted(str(v[0]) for v in values)
+            column["distinct"] = distinct
+        elif col_type in NUMERIC_TYPES:
+            count, min_val, max_val = cursor.execute(
+                f'SELECT COUNT({col}), MIN({col}), MAX({col}) FROM "{table_name}"'
+            ).fetchone()
+            if count:
+                column["min"] = min_val
+                column["max"] = max_val
+        columns.append(column)
+
+    return {"table": table_name, "columns": columns}
+
+
+# 요약 → 프롬프트용 테이블 설명
+def render_table_info(summary):
+    table_info = f'Table Name: "{summary["table"]}"\nColumns:'
+    for column in summary["columns"]:
+        col_name, col_type = column["name"], column["type"]
+        if "values" in column:
+            examples = ", ".join(f'"{v}"' for v in column["values"])
+            if column.get("pruned"):
+                note = f' (전체 {column["distinct"]}개 중 질문 관련 값)'
+            elif column["distinct"] > len(column["values"]):
+                note = f' (전체 {column["distinct"]}개 중 빈도 상위)'
+            else:
+                note = ""
+            table_info += f'\n- "{col_name}" (TEXT) -- 가능한 값{note}: [{examples}]'
+        elif "min" in column:
+            table_info += f'\n- "{col_name}" ({col_type}) -- 범위: [{column["min"]} ~ {column["max"]}]'
+        else:
+            table_info += f'\n- "{col_name}" ({col_type})'
+    return table_info
+
+
+# 질문과 매칭된 단어(컬럼명/값)만 남긴 요약
+#   - 첫 컬럼과 TEXT 컬럼은 유지하되, 값이 매칭된 컬럼은 매칭된 값만 남김
+#   - 숫자 컬럼은 컬럼명이 매칭된 것만 남김 (매칭된 숫자 컬럼이 없으면 모두 유지)
+#   - 테이블명만 매칭되었으면 전체 요약 사용
+def prune_summary(summary, words):
+    columns = summary["columns"]
+    matched_columns = {c["name"] for c in columns if c["name"] in words}
+    matched_values = {
+        c["name"]: [v for v in c["values"] if v in words] for c in columns if "values" in c
+    }
+    if not matched_columns and not any(matched_values.values()):
+        return summary
+
+    keep_numeric = any(c["name"] in matched_columns for c in columns if "values" not in c)
+    pruned = []
+    for i, column in enumerate(columns):
+        if "values" in column:
+            values = matched_values[column["name"]]
+            if values:
+                column = dict(column, values=values, pruned=True)
+        elif i > 0 and keep_numeric and column["name"] not in matched_columns:
+            continue
+        pruned.append(column)
+    return {"table": summary["table"], "columns": pruned}
+
+
+# 테이블 스키마 정보 생성
+def generate_table_info_with_full_values(conn, table_name):
+    return render_table_info(summarize_table(conn, table_name))
+
+
+# CSV 파일 버전 (수정 시각 + 크기)
+def csv_version(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+# 테이블을 CSV에서 적재한 뒤 버전 기록 (카탈로그가 같은 CSV를 다시 적재하지 않도록)
+def record_table_version(conn, table_name, version):
+    conn.execute("CREATE TABLE IF NOT EXISTS _table_versions (table_name TEXT PRIMARY KEY, version TEXT)")
+    conn.execute("INSERT OR REPLACE INTO _table_versions VALUES (?, ?)", (table_name, version))
+    conn.commit()
+
+
+# CSV 한 개를 테이블로 적재 (테이블명 = 파일명)
+def load_csv_table(conn, csv_path, version=None):
+    table_name = os.path.basename(csv_path)[:-4]
+    df = pd.read_csv(csv_path)
+    df.to_sql(table_name, conn, if_exists="replace", index=False)
+    record_table_version(conn, table_name, version or csv_version(csv_path))
+    return table_name
+
+
+# 스키마 카탈로그: 처음 사용할 때 로딩하고, 바뀐 테이블만 DB 적재/요약을 다시 수행
+# 조회는 마지막 스캔 결과(스냅샷)를 사용하고, 명시적 무효화(load_table/invalidate) 또는
+# CSV 폴더 수정 시각 변경, 주기적 전체 확인 때만 다시 스캔
+class SchemaCatalog:
+    def __init__(self, db_path, csv_dir, include_tables=None):
+        self.db_path = db_path
+        self.csv_dir = csv_dir
+        self.include_tables = include_tables
+        self._versions = {}    # table -> version
+        self._summaries = {}   # table -> (version, summary, table_info)
+        self._schema_version = None
+        self._listeners = []   # 테이블 버전이 바뀌면 호출 (table_name)
+        self._lock = threading.Lock()
+        self._initialized = False  # 버전/요약 테이블 생성 여부
+        self._stale = True
+        self._checked = 0.0    # 마지막 확인 시각 (monotonic)
+        self._scanned = 0.0    # 마지막 전체 스캔 시각 (monotonic)
+        self._dir_mtime = None
+
+    def add_reload_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _included(self, table_name):
+        return self.include_tables is None or table_name in self.include_tables
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        if not self._initialized:
+            conn.execute("CREATE TABLE IF NOT EXISTS _table_versions (table_name TEXT PRIMARY KEY, version TEXT)")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (table_name TEXT PRIMARY KEY, version TEXT, summary TEXT)"
+            )
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    # DB에 저장된 요약을 버전이 같을 때만 사용하고, 없으면 계산 후 저장
+    def _load_summary(self, conn, table_name, version):
+        row = conn.execute(
+            f"SELECT version, summary FROM {CATALOG_TABLE} WHERE table_name = ?", (table_name,)
+        ).fetchone()
+        if row is not None and row[0] == version:
+            return json.loads(row[1])
+
+        print(f"[INFO] 스키마 요약 생성: {table_name}")
+        summary = summarize_table(conn, table_name)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {CATALOG_TABLE} VALUES (?, ?, ?)",
+            (table_name, version, json.dumps(summary, ensure_ascii=False))
+        )
+        conn.commit()
+        return summary
+
+    def _csv_dir_mtime(self):
+        try:
+            return os.stat(self.csv_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    # 다음 조회 때 다시 스캔
+    def invalidate(self):
+        self._stale = True
+
+    # CSV 한 개를 DB에 적재 (카탈로그 잠금 안에서 적재해 refresh와 같은 테이블을 동시에 쓰지 않음)
+    def load_table(self, csv_path):
+        with self._lock:
+            conn = self._connect()
+            try:
+                table_name = load_csv_table(conn, csv_path)
+            finally:
+                conn.close()
+            self._stale = True
+        self.refresh()
+        return table_name
+
+    # 스냅샷이 오래됐을 때만 refresh (매 조회마다 DB 연결/CSV stat을 하지 않음)
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if not self._stale and now - self._checked < CATALOG_CHECK_INTERVAL:
+            return
+        if (self._stale or now - self._scanned >= CATALOG_RESCAN_INTERVAL
+                or self._csv_dir_mtime() != self._dir_mtime):
+            self.refresh()
+        else:
+            self._checked = now
+
+    # CSV가 바뀐 테이블만 DB에 다시 적재하고 요약을 갱신 (새 스냅샷을 만든 뒤 한 번에 교체)
+    def refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            dir_mtime = self._csv_dir_mtime()
+            conn = self._connect()
+            try:
+                stored_versions = dict(conn.execute("SELECT table_name, version FROM _table_versions").fetchall())
+                db_tables = {
+                    row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+                    if not row[0].startswith("_")
+                }
+
+                versions = {}
+                for cp in glob.glob(os.path.join(self.csv_dir, "*.csv")):
+                    table_name = os.path.basename(cp)[:-4]
+                    if not self._included(table_name):
+                        continue
+                    version = csv_version(cp)
+                    if stored_versions.get(table_name) != version or table_name not in db_tables:
+                        print(f"[INFO] 테이블 적재: {table_name}")
+                        load_csv_table(conn, cp, version)
+                    versions[table_name] = version
+
+                # CSV 없이 DB에만 있는 테이블은 저장된 버전(없으면 고정값) 사용
+                for table_name in db_tables:
+                    if table_name not in versions and self._included(table_name):
+                        versions[table_name] = stored_versions.get(table_name, "db")
+
+                summaries = {}
+                changed = []
+                for table_name, version in versions.items():
+                    cached = self._summaries.get(table_name)
+                    if cached is None or cached[0] != version:
+                        summary = self._load_summary(conn, table_name, version)
+                        summaries[table_name] = (version, summary, render_table_info(summary))
+                        if cached is not None:
+                            changed.append(table_name)
+                    else:
+                        summaries[table_name] = cached
+                changed.extend(t for t in self._summaries if t not in versions)
+
+                raw = "|".join(f"{t}={v}" for t, v in sorted(versions.items()))
+                self._summaries, self._versions = summaries, versions
+                self._schema_version = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+                self._stale = False
+                self._checked = self._scanned = now
+                self._dir_mtime = dir_mtime
+            finally:
+                conn.close()
+
+            for table_name in changed:
+                for listener in self._listeners:
+                    listener(table_name)
+        return self
+
+    def table_names(self):
+        self._ensure_fresh()
+        return sorted(self._versions)
+
+    def table_versions(self):
+        self._ensure_fresh()
+        return dict(self._versions)
+
+    def table_info(self, tables=None):
+        self._ensure_fresh()
+        summaries = self._summaries
+        names = sorted(summaries) if tables is None else [t for t in tables if t in summaries]
+        return "\n\n\n".join(summaries[t][2] for t in names)
+
+    # 질문 관련 테이블만, 매칭된 단어 기준으로 축소한 스키마 설명 ({테이블: 매칭 단어 집합})
+    def pruned_table_info(self, matches):
+        self._ensure_fresh()
+        summaries = self._summaries
+        names = [t for t in matches if t in summaries]
+        return "\n\n\n".join(render_table_info(prune_summary(summaries[t][1], matches[t])) for t in names)
+
+    # 테이블별 컬럼 요약 (컬럼명/타입/가능한 값/범위)
+    def summaries(self):
+        self._ensure_fresh()
+        return {t: entry[1] for t, entry in self._summaries.items()}
+
+    # 전체 스키마 버전 (테이블 버전들의 해시)
+    def schema_version(self):
+        self._ensure_fresh()
+        return self._schema_version
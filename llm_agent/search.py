@@ -1,16 +1,51 @@
 import os
+import json
 import pickle
 import faiss
-from sentence_transformers import SentenceTransformer
 import numpy as np
 import re
+import threading
+import time
+from llm_agent.cache import LRUCache
+from llm_agent.meta_store import MetaStore, meta_store_exists
+from llm_agent.encoder import ENCODER_BACKEND, load_encoder
+from llm_agent.embedding import (
+    add_table_vectors,
+    collect_table_words,
+    ensure_id_map,
+    remove_table_vectors,
+    save_index_files,
+    table_row_ids,
+)
+from llm_agent.ngram_index import (
+    RowNgramIndex,
+    build_partial_match_index,
+    find_partial_matches,
+    ngram_index_exists,
+)
 
 
 # 경로 설정
 FAISS_INDEX_PATH = os.path.abspath("./data/faiss/faiss_index.idx")
-META_PATH = os.path.abspath("./data/faiss/faiss_meta.pkl")
+META_PATH = os.path.abspath("./data/faiss/faiss_meta")  # 컬럼형 메타 저장소 prefix
+LEGACY_META_PATH = os.path.abspath("./data/faiss/faiss_meta.pkl")
+NGRAM_PATH = os.path.abspath("./data/faiss/faiss_ngram")  # 메타 행 n-gram 역색인 prefix
+INDEX_CONFIG_PATH = os.path.abspath("./data/faiss/faiss_index.json")
 SBERT_PATH = os.path.abspath("./llm_agent/KURE-v1")
 
+# 검색 설정
+SEARCH_TOP_K = 512      # 유사도 후보 최대 개수
+IVF_NPROBE = None       # None이면 인덱스에 저장된 값 사용
+HNSW_EF_SEARCH = None   # None이면 인덱스에 저장된 값 사용
+
+# 검색 캐시 설정 (정규화된 쿼리 기준)
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_TTL = 60 * 60       # 초
+SEARCH_CACHE_DISK_PATH = None    # 예: os.path.abspath("./data/faiss/search_cache.db")
+
+# 질문-단어 매칭 임계값 (SQL 프롬프트 스키마 축소용)
+MATCH_THRESHOLD = 0.6
+
 
 # 정규화 함수
 def normalize_token(text):
@@ -20,34 +55,71 @@ def normalize_token(text):
     return text.strip()
 
 
+# 쿼리 임베딩 함수
+def encode_query(query_norm, model):
+    return model.encode(query_norm, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+
+
+# 검색 파라미터(재현율-속도 조절) 적용
+def configure_search_params(index, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH):
+    # IDMap / 전처리(PCA·OPQ) 래퍼 안쪽의 실제 인덱스
+    base = faiss.downcast_index(index)
+    while isinstance(base, (faiss.IndexIDMap, faiss.IndexPreTransform)):
+        base = faiss.downcast_index(base.index)
+    if nprobe is not None and isinstance(base, faiss.IndexIVF):
+        base.nprobe = nprobe
+    if ef_search is not None and isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search
+    return index
+
+
+# thres1 이상인 상위 top_k 후보만 조회 (유사도 내림차순)
+def search_index(index, query_vec, thres1, top_k=SEARCH_TOP_K):
+    query = np.array([query_vec], dtype=np.float32)
+    try:
+        # Flat/IVF: 임계값 기반 range search
+        lims, D, I = index.range_search(query, thres1)
+        order = np.argsort(-D, kind="stable")[:top_k]
+        return D[order], I[order]
+    except RuntimeError:
+        # HNSW 등 range search 미지원 인덱스: 제한된 k로 검색 후 필터링
+        D, I = index.search(query, min(top_k, index.ntotal))
+        keep = (I[0] >= 0) & (D[0] >= thres1)
+        return D[0][keep], I[0][keep]
+
+
 # 검색 함수
-def search_faiss_with_partial_and_similarity(query_word, model, index, meta, file_token_index, thres1=0.4, thres2=0.5):
+def search_faiss_with_partial_and_similarity(query_word, model, index, meta, file_token_index, thres1=0.4, thres2=0.5,
+                                             query_vec=None, partial_index=None):
     query_norm = normalize_token(query_word)
-    query_vec = model.encode(query_norm, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+    if query_vec is None:
+        query_vec = encode_query(query_norm, model)
+    if partial_index is None:
+        partial_index = build_partial_match_index(file_token_index, RowNgramIndex.build(meta_word_norms(meta)))
     print("query_vec.shape:", np.array([query_vec]).shape)
     print("index.d (expected):", index.d)
     candidate_files = {}
     partial_hits = {}
 
-    for file_name, norm_tokens in file_token_index.items():
-        for token in norm_tokens:
-            if query_norm in token and query_norm != token:
-                partial_hits[file_name] = {
-                    "file": file_name,
-                    "word": file_name,
-                    "score": 1.0,
-                    "match_type": "부분 포함"
-                }
+    # n-gram 역색인으로 부분 포함 후보 조회
+    partial_files, partial_word_ids = find_partial_matches(partial_index, query_norm, meta)
+    for file_name in partial_files:
+        partial_hits[file_name] = {
+            "file": file_name,
+            "word": file_name,
+            "score": 1.0,
+            "match_type": "부분 포함"
+        }
 
-    D, I = index.search(np.array([query_vec]), index.ntotal)
+    D, I = search_index(index, query_vec, thres1)
 
-    for dist, idx in zip(D[0], I[0]):
-        if dist < thres1:
+    for dist, idx in zip(D, I):
+        if meta[idx] is None:  # 삭제된 테이블의 벡터
             continue
         file_name, word_norm, word_raw = meta[idx]
         if file_name in partial_hits:
             continue
-        if query_norm in word_norm and query_norm != word_norm:
+        if idx in partial_word_ids:
             partial_hits[file_name] = {
                 "file": file_name,
                 "word": word_raw,
@@ -69,10 +141,305 @@ def search_faiss_with_partial_and_similarity(query_word, model, index, meta, fil
     return [os.path.splitext(item["file"])[0] for item in sorted_results]
 
 # 모델, 인덱스, 메타, 토큰 인덱스 로딩 함수 추가
+# 인덱스를 만든 임베딩 모델 경로 (설정 파일이 없으면 KURE-v1)
+def resolve_model_path():
+    if os.path.exists(INDEX_CONFIG_PATH):
+        with open(INDEX_CONFIG_PATH, encoding="utf-8") as f:
+            model_name = json.load(f).get("model_name")
+        if model_name:
+            return os.path.abspath(os.path.join("./llm_agent", os.path.basename(model_name.rstrip("/"))))
+    return SBERT_PATH
+
+
+def load_model(model_path=None):
+    return load_encoder(model_path or resolve_model_path(), ENCODER_BACKEND, device="cpu")  # cuda도 가능
+
+
+def load_index():
+    index = configure_search_params(faiss.read_index(FAISS_INDEX_PATH))
+    if meta_store_exists(META_PATH):
+        meta = MetaStore.open(META_PATH)
+    else:
+        # 이전 형식(pickle 리스트) 호환
+        with open(LEGACY_META_PATH, "rb") as f:
+            meta = pickle.load(f)
+    file_token_index = build_file_token_index(meta)
+    return index, meta, file_token_index
+
+
+# 메타 → 파일명 토큰 / 단어 목록 (삭제된 행은 None)
+def build_file_token_index(meta):
+    if isinstance(meta, MetaStore):
+        return {file: [normalize_token(file)] for file in meta.live_file_names()}
+    return {row[0]: [normalize_token(row[0])] for row in meta if row is not None}
+
+
+def meta_word_norms(meta):
+    return [row[1] if row is not None else None for row in meta]
+
+
 def load_components():
-    model = SentenceTransformer(SBERT_PATH, device="cpu")  # cuda도 가능
-    index = faiss.read_index(FAISS_INDEX_PATH)
-    with open(META_PATH, "rb") as f:
-        meta = pickle.load(f)
-    file_token_index = {file: [normalize_token(file)] for file, _, _ in meta}
+    model = load_model()
+    index, meta, file_token_index = load_index()
     return model, index, meta, file_token_index
+
+
+# 부분 포함 n-gram 역색인 로딩 (메모리 매핑으로 바로 열고, 없거나 메타와 행 수가 다를 때만 메타 전체로 생성해 저장)
+def load_partial_index(meta, file_token_index):
+    word_index = None
+    if ngram_index_exists(NGRAM_PATH):
+        word_index = RowNgramIndex.open(NGRAM_PATH)
+    if word_index is None or len(word_index) != len(meta):
+        print("[INFO] n-gram 역색인이 없거나 메타와 맞지 않아 다시 생성합니다.")
+        word_index = RowNgramIndex.build(meta_word_norms(meta))
+        try:
+            word_index.save(NGRAM_PATH)
+        except OSError as e:
+            print(f"[ERROR] n-gram 역색인 저장 실패: {e}")
+    return build_partial_match_index(file_token_index, word_index)
+
+
+# 인덱스 버전 (파일이 다시 생성되면 바뀜)
+def index_version():
+    # 인덱스 파일은 메타/역색인보다 마지막에 교체되므로 인덱스 파일만 확인
+    index_stat = os.stat(FAISS_INDEX_PATH)
+    return f"{index_stat.st_mtime_ns}-{index_stat.st_size}"
+
+
+# 상주 검색 엔진 (모델/인덱스/메타를 프로세스당 한 번만 로딩)
+class SearchEngine:
+    def __init__(self, warmup_query="인구", cache_size=SEARCH_CACHE_SIZE, cache_ttl=SEARCH_CACHE_TTL,
+                 cache_disk_path=SEARCH_CACHE_DISK_PATH):
+        self.warmup_query = warmup_query
+        self.model = None
+        self.index = None
+        self.meta = None
+        self.file_token_index = None
+        self.partial_index = None
+        self.index_version = None
+        self.metrics = {
+            "load_time": None,
+            "warmup_time": None,
+            "index_reloads": 0,
+            "query_count": 0,
+            "total_query_time": 0.0,
+        }
+        # 쿼리 벡터는 모델/백엔드에만, 검색 결과는 인덱스 버전에 종속
+        self.model_path = None
+        self.model_version = None
+        self.vector_cache = LRUCache(cache_size, cache_ttl, cache_disk_path, namespace="query_vector")
+        self.result_cache = LRUCache(cache_size, cache_ttl, cache_disk_path, namespace="search_result")
+        self._load_lock = threading.Lock()
+        self._search_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        with self._load_lock:
+            if self.loaded:
+                return self
+
+            start = time.perf_counter()
+            model_path = resolve_model_path()
+            model = load_model(model_path)
+            self.model_path = model_path
+            self.model_version = f"{model_path}:{ENCODER_BACKEND}"
+            self._load_index()
+            self.metrics["load_time"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            encode_query(normalize_token(self.warmup_query), model)
+            self.metrics["warmup_time"] = time.perf_counter() - start
+
+            self.model = model
+            print(f"[INFO] 검색 엔진 로딩 완료 (load {self.metrics['load_time']:.2f}s, warm-up {self.metrics['warmup_time']:.2f}s)")
+        return self
+
+    # _load_lock을 잡은 상태에서 호출
+    # 인덱스를 만든 모델이 바뀌었으면(예: --model kpf128로 재생성) 모델도 다시 로딩해 인덱스와 함께 교체
+    def _load_index(self):
+        version = index_version()
+        model_path = resolve_model_path()
+        model = None
+        if self.model is not None and model_path != self.model_path:
+            print(f"[INFO] 인덱스 임베딩 모델 변경 감지: {self.model_path} → {model_path}, 모델 재로딩")
+            model = load_model(model_path)
+        index, meta, file_token_index = load_index()
+        partial_index = load_partial_index(meta, file_token_index)
+        with self._search_lock:
+            if model is not None:
+                self.model, self.model_path = model, model_path
+                self.model_version = f"{model_path}:{ENCODER_BACKEND}"
+            self.index, self.meta, self.file_token_index = index, meta, file_token_index
+            self.partial_index = partial_index
+            self.index_version = version
+
+    # 인덱스 파일이 다시 생성되었으면 인덱스/메타(모델이 바뀌었으면 모델도) 재로딩 (이전 버전 캐시는 자동 무효화)
+    def _refresh_if_changed(self):
+        if index_version() == self.index_version:
+            return
+        with self._load_lock:
+            self._refresh_if_changed_locked()
+
+    def _refresh_if_changed_locked(self):
+        if index_version() != self.index_version:
+            print("[INFO] FAISS 인덱스 변경 감지, 인덱스 재로딩")
+            self._load_index()
+            self.metrics["index_reloads"] += 1
+
+    def search(self, query_word, thres1=0.4, thres2=0.5):
+        self.load()
+        self._refresh_if_changed()
+        start = time.perf_counter()
+        query_norm = normalize_token(query_word)
+        result_key = f"{query_norm}|{thres1}|{thres2}"
+
+        results = self.result_cache.get(result_key, version=self.index_version)
+        if results is None:
+            # 임베딩 계산은 동시에 수행하고, 인덱스/메타 접근만 직렬화
+            model, model_version = self._model_snapshot()
+            query_vec = self._query_vector(query_norm, model, model_version)
+            with self._search_lock:
+                if self.model_version != model_version:  # 그 사이 모델이 교체됨 (인덱스 차원이 다를 수 있음)
+                    query_vec = encode_query(query_norm, self.model)
+                results = search_faiss_with_partial_and_similarity(
+                    query_word, self.model, self.index, self.meta, self.file_token_index, thres1, thres2,
+                    query_vec=query_vec, partial_index=self.partial_index
+                )
+                version = self.index_version
+            self.result_cache.set(result_key, results, version=version)
+
+        with self._search_lock:
+            self.metrics["query_count"] += 1
+            self.metrics["total_query_time"] += time.perf_counter() - start
+        return results
+
+    def _model_snapshot(self):
+        with self._search_lock:
+            return self.model, self.model_version
+
+    def _query_vector(self, query_norm, model=None, model_version=None):
+        if model is None:
+            model, model_version = self._model_snapshot()
+        query_vec = self.vector_cache.get(query_norm, version=model_version)
+        if query_vec is None:
+            query_vec = encode_query(query_norm, model)
+            self.vector_cache.set(query_norm, query_vec, version=model_version)
+        return query_vec
+
+    # 여러 텍스트 임베딩: 벡터 캐시에 없는 것만 한 번의 model.encode 배치로 계산
+    def _query_vectors(self, texts, model, model_version):
+        vecs = [self.vector_cache.get(t, version=model_version) for t in texts]
+        missing = [i for i, vec in enumerate(vecs) if vec is None]
+        if missing:
+            encoded = model.encode([texts[i] for i in missing], convert_to_numpy=True,
+                                   normalize_embeddings=True).astype(np.float32)
+            for i, vec in zip(missing, encoded):
+                vecs[i] = vec
+                self.vector_cache.set(texts[i], vec, version=model_version)
+        return vecs
+
+    # 임의 텍스트 임베딩 (SQL 캐시 등에서 같은 인코더/벡터 캐시 사용)
+    def encode(self, text):
+        return self.encode_versioned(text)[0]
+
+    # (벡터, 모델 버전): 벡터를 저장해 두고 비교하는 쪽에서 모델이 바뀌었는지 구분할 때 사용
+    def encode_versioned(self, text):
+        self.load()
+        model, model_version = self._model_snapshot()
+        return self._query_vector(text, model, model_version), model_version
+
+    # 질문 전체와 어절별로 인덱스 단어(테이블명/컬럼명/값)를 조회해 (테이블, 단어, 점수) 목록 반환
+    def match_words(self, question, thres=MATCH_THRESHOLD):
+        self.load()
+        self._refresh_if_changed()
+        tokens = [question] + [t for t in re.split(r"[\s,.?!]+", question) if len(normalize_token(t)) >= 2]
+        tokens = [normalize_token(t) for t in dict.fromkeys(tokens)]
+        model, model_version = self._model_snapshot()
+        query_vecs = self._query_vectors(tokens, model, model_version)
+
+        best = {}
+        with self._search_lock:
+            if self.model_version != model_version:  # 그 사이 모델이 교체됨
+                query_vecs = self.model.encode(tokens, convert_to_numpy=True,
+                                               normalize_embeddings=True).astype(np.float32)
+            for query_vec in query_vecs:
+                D, I = search_index(self.index, query_vec, thres)
+                for dist, idx in zip(D, I):
+                    row = self.meta[idx]
+                    if row is None:
+                        continue
+                    key = (os.path.splitext(row[0])[0], row[2])
+                    best[key] = max(best.get(key, 0.0), float(dist))
+
+        matches = [{"file": f, "word": w, "score": score} for (f, w), score in best.items()]
+        return sorted(matches, key=lambda x: x["score"], reverse=True)
+
+    # 새로 생성된 CSV 한 개만 임베딩해 인덱스에 반영 (같은 테이블이 있으면 교체)
+    # 메타/역색인은 추가된 행만 반영해 검색 락 밖에서 만들고, 락 안에서는 FAISS 삭제/추가와 참조 교체만 수행
+    def index_csv(self, csv_path):
+        self.load()
+        start = time.perf_counter()
+        table_name, words = collect_table_words(csv_path)
+        model, model_version = self._model_snapshot()
+        embeddings = model.encode(words, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32)
+        word_norms = [normalize_token(w) for w in words]
+
+        with self._load_lock:
+            self._refresh_if_changed_locked()
+            if self.model_version != model_version:  # 인덱스가 다른 모델로 다시 생성됨
+                embeddings = self.model.encode(words, convert_to_numpy=True,
+                                               normalize_embeddings=True).astype(np.float32)
+            removed_ids = table_row_ids(self.meta, table_name)
+            meta = self.meta.copy()
+            for i in removed_ids:
+                meta[i] = None
+            row_start = len(meta)
+            meta.extend((table_name, norm, raw) for norm, raw in zip(word_norms, words))
+            word_index = self.partial_index["words"].with_rows(row_start, word_norms)
+            file_token_index = dict(self.file_token_index)
+            file_token_index[table_name] = [normalize_token(table_name)]
+            partial_index = build_partial_match_index(file_token_index, word_index)
+            index = ensure_id_map(self.index)  # 이전 형식 인덱스면 새 인덱스로 변환 (기존 인덱스는 읽기만)
+
+            with self._search_lock:
+                removed = remove_table_vectors(index, removed_ids, table_name)
+                added = add_table_vectors(index, row_start, embeddings)
+                self.index, self.meta, self.file_token_index = index, meta, file_token_index
+                self.partial_index = partial_index
+
+            save_index_files(index, meta, FAISS_INDEX_PATH, META_PATH, NGRAM_PATH, word_index)
+            # 저장된 파일을 다시 열어 메모리에 쌓인 추가분을 비움 (메모리 매핑이므로 즉시 열림)
+            meta = MetaStore.open(META_PATH)
+            partial_index = build_partial_match_index(file_token_index, RowNgramIndex.open(NGRAM_PATH))
+            with self._search_lock:
+                self.meta, self.partial_index = meta, partial_index
+            self.index_version = index_version()
+
+        print(f"[INFO] 인덱스 증분 갱신 완료: {table_name} (추가 {added}, 삭제 {removed}, {time.perf_counter() - start:.2f}s)")
+        return {"table": table_name, "added": added, "removed": removed}
+
+    def get_metrics(self):
+        metrics = dict(self.metrics)
+        count = metrics["query_count"]
+        metrics["avg_query_time"] = metrics["total_query_time"] / count if count else None
+        metrics["loaded"] = self.loaded
+        metrics["index_version"] = self.index_version
+        metrics["vector_cache"] = self.vector_cache.stats()
+        metrics["result_cache"] = self.result_cache.stats()
+        return metrics
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_search_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = SearchEngine()
+    return _engine
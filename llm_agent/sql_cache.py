@@ -0,0 +1,140 @@
+import os
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+
+
+# 질문 임베딩 기반 SQL 캐시 설정
+SQL_CACHE_THRESHOLD = 0.95   # 코사인 유사도 (정규화된 임베딩의 내적)
+SQL_CACHE_MAXSIZE = 1000
+SQL_CACHE_POLICY = "lru"     # "lru": 마지막 사용 시각, "lfu": 적중 횟수 기준으로 제거
+
+
+# 비슷한 질문(같은 스키마 버전)에 대해 검증된 SQL을 재사용하는 영구 캐시 (SQLite 저장)
+class SemanticSQLCache:
+    def __init__(self, path, threshold=SQL_CACHE_THRESHOLD, maxsize=SQL_CACHE_MAXSIZE, policy=SQL_CACHE_POLICY):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"지원하지 않는 캐시 제거 정책: {policy}")
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidated": 0}
+
+        # 현재 스키마 버전의 항목만 메모리에 임베딩 행렬로 보관
+        self._schema_version = None
+        self._ids = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sql_cache ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT, schema_version TEXT, embedding BLOB, "
+            "queries TEXT, created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        self._db.commit()
+
+    # 스키마 버전이 바뀌면 이전 버전 항목을 삭제하고 현재 버전 항목을 다시 읽음
+    def _use_schema(self, schema_version):
+        if schema_version == self._schema_version:
+            return
+        cursor = self._db.execute("DELETE FROM sql_cache WHERE schema_version != ?", (schema_version,))
+        self._stats["invalidated"] += cursor.rowcount
+        self._db.commit()
+
+        rows = self._db.execute(
+            "SELECT id, embedding FROM sql_cache WHERE schema_version = ? ORDER BY id", (schema_version,)
+        ).fetchall()
+        self._ids = [row[0] for row in rows]
+        self._vectors = (
+            np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows else np.zeros((0, 0), dtype=np.float32)
+        )
+        self._schema_version = schema_version
+
+    # 가장 비슷한 이전 질문이 임계값 이상이면 (id, 질문, SQL 목록, 유사도) 반환
+    def lookup(self, question_vec, schema_version):
+        with self._lock:
+            self._use_schema(schema_version)
+            if not self._ids:
+                self._stats["misses"] += 1
+                return None
+
+            scores = self._vectors @ np.asarray(question_vec, dtype=np.float32)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self._stats["misses"] += 1
+                return None
+
+            entry_id = self._ids[best]
+            question, queries = self._db.execute(
+                "SELECT question, queries FROM sql_cache WHERE id = ?", (entry_id,)
+            ).fetchone()
+            self._db.execute(
+                "UPDATE sql_cache SET last_used = ?, hits = hits + 1 WHERE id = ?", (time.time(), entry_id)
+            )
+            self._db.commit()
+            self._stats["hits"] += 1
+            return {"id": entry_id, "question": question, "queries": json.loads(queries), "score": float(scores[best])}
+
+    def add(self, question, question_vec, schema_version, queries):
+        question_vec = np.asarray(question_vec, dtype=np.float32)
+        now = time.time()
+        with self._lock:
+            self._use_schema(schema_version)
+            cursor = self._db.execute(
+                "INSERT INTO sql_cache (question, schema_version, embedding, queries, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (question, schema_version, question_vec.tobytes(), json.dumps(queries, ensure_ascii=False), now, now)
+            )
+            self._ids.append(cursor.lastrowid)
+            self._vectors = np.vstack([self._vectors, question_vec]) if self._vectors.size else question_vec[None, :]
+            self._stats["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    # 재사용한 SQL이 실행에 실패하면 해당 항목 제거
+    def discard(self, entry_id):
+        with self._lock:
+            self._db.execute("DELETE FROM sql_cache WHERE id = ?", (entry_id,))
+            self._db.commit()
+            self._remove_ids({entry_id})
+            self._stats["invalidated"] += 1
+
+    def _evict(self):
+        count = self._db.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+        if count <= self.maxsize:
+            return
+        order = "last_used" if self.policy == "lru" else "hits, last_used"
+        rows = self._db.execute(
+            f"SELECT id FROM sql_cache ORDER BY {order} LIMIT ?", (count - self.maxsize,)
+        ).fetchall()
+        evicted = {row[0] for row in rows}
+        self._db.executemany("DELETE FROM sql_cache WHERE id = ?", [(i,) for i in evicted])
+        self._remove_ids(evicted)
+        self._stats["evictions"] += len(evicted)
+
+    def _remove_ids(self, ids):
+        keep = [i for i, entry_id in enumerate(self._ids) if entry_id not in ids]
+        self._ids = [self._ids[i] for i in keep]
+        self._vectors = self._vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM sql_cache")
+            self._db.commit()
+            self._ids = []
+            self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._ids)
+        total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / total if total else None
+        stats["threshold"] = self.threshold
+        stats["policy"] = self.policy
+        return stats
@@ -1,13 +1,20 @@
 import os
 import re
 import difflib
-import glob
 import sqlite3
+import threading
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 import pandas as pd
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
-from langchain_community.utilities import SQLDatabase
+from llm_agent.schema_catalog import SchemaCatalog
+from llm_agent.search import get_search_engine
+from llm_agent.sql_cache import SemanticSQLCache
+from llm_agent.result_cache import QueryResultCache, referenced_tables
+from llm_agent.db_pool import ReadOnlyPool
+from llm_agent.result_format import serialize_results
 
 
 # 설정
@@ -19,66 +26,50 @@ CSV_DIR = os.path.join(BASE_DIR, "data", "csv_data")
 BASE_URL = ""
 MODEL_NAME = "Qwen3-14B"
 
+# LLM 엔드포인트 연결 풀 (동시 요청 수에 맞춰 연결 재사용)
+LLM_MAX_CONNECTIONS = 32
+LLM_TIMEOUT = 300
 
-# DB 초기화 및 CSV 파일 읽기 (원하는 테이블만)
-include_tables = ["전라북도_대학교_면적", "전라북도_대학교_인원현황"]  # 원하는 테이블명
+# 질문 임베딩 기반 SQL 캐시 (None이면 사용 안 함)
+SQL_CACHE_PATH = os.path.join(BASE_DIR, "data", "sql_cache.db")
+
+# 쿼리 결과 캐시 (Parquet 디스크 계층 경로, None이면 메모리만 사용)
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, "data", "result_cache")
+
+# SELECT 병렬 실행용 읽기 전용 연결 수 (모든 요청이 공유)
+DB_POOL_SIZE = 4
+# 요청 하나에서 동시에 실행할 SELECT 수 (스레드는 요청마다 따로 생성, 다른 요청의 쿼리를 기다리지 않음)
+QUERY_WORKERS_PER_REQUEST = 4
+
+# 질문 기반 스키마 축소 (False면 전체 스키마 사용)
+SCHEMA_PRUNING = True
+PRUNE_MAX_TABLES = 3
 
-conn = sqlite3.connect(DB_PATH)
-csv_files = glob.glob(os.path.join(CSV_DIR, "*.csv"))
-for cp in csv_files:
-    table_name = os.path.basename(cp)[:-4]
-    if table_name in include_tables:
-        df = pd.read_csv(cp)
-        df.to_sql(table_name, conn, if_exists="replace", index=False)
 
-cursor = conn.cursor()
-cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-table_names = [row[0] for row in cursor.fetchall() if row[0] in include_tables]
+# 스키마 카탈로그 (원하는 테이블만, 처음 사용할 때 DB 적재 및 요약)
+include_tables = ["전라북도_대학교_면적", "전라북도_대학교_인원현황"]  # 원하는 테이블명
+catalog = SchemaCatalog(DB_PATH, CSV_DIR, include_tables)
 
 
 # LLM 연결
+llm_http_client = httpx.Client(
+    limits=httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_CONNECTIONS),
+    timeout=LLM_TIMEOUT,
+)
 llm = ChatOpenAI(
     base_url=BASE_URL,
     api_key="not-needed",
     model=MODEL_NAME,
     max_tokens=5000,
+    http_client=llm_http_client,
 )
 
-db = SQLDatabase.from_uri(f"sqlite:///{DB_PATH}")
-
-
-# 테이블 스키마 정보 생성
-def generate_table_info_with_full_values(conn, table_name):
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info('{table_name}')")
-    schema_rows = cursor.fetchall()
-    df = pd.read_sql_query(f'SELECT * FROM "{table_name}"', conn)
-
-    table_info = f'Table Name: "{table_name}"\nColumns:'
-    for row in schema_rows:
-        col_name = row[1]
-        col_type = row[2].upper()
-
-        if col_type == "TEXT":
-            unique_values = df[col_name].dropna().unique().tolist()
-            unique_values = sorted(str(val) for val in unique_values)
-            examples = ", ".join(f'"{v}"' for v in unique_values)
-            table_info += f'\n- "{col_name}" (TEXT) -- 가능한 값: [{examples}]'
-        elif col_type in ["INTEGER", "REAL", "FLOAT", "NUMERIC", "DOUBLE"]:
-            if not df[col_name].dropna().empty:
-                min_val = df[col_name].min()
-                max_val = df[col_name].max()
-                table_info += f'\n- "{col_name}" ({col_type}) -- 범위: [{min_val} ~ {max_val}]'
-            else:
-                table_info += f'\n- "{col_name}" ({col_type})'
-        else:
-            table_info += f'\n- "{col_name}" ({col_type})'
+sql_cache = SemanticSQLCache(SQL_CACHE_PATH) if SQL_CACHE_PATH else None
+result_cache = QueryResultCache(RESULT_CACHE_DIR)
+catalog.add_reload_listener(result_cache.invalidate_table)
 
-    return table_info
+db_pool = ReadOnlyPool(DB_PATH, DB_POOL_SIZE)
 
-final_table_info = "\n\n\n".join(
-    generate_table_info_with_full_values(conn, table) for table in table_names
-)
 
 # SQL 프롬프트
 sql_prompt = ChatPromptTemplate.from_messages([
@@ -171,6 +162,28 @@ Output ONLY the final executable SQL query or queries. Any deviation from these
 sql_chain = sql_prompt | llm
 
 
+# SQL 수정 프롬프트 (실패한 쿼리 하나와 오류, 해당 테이블 스키마만 전달)
+repair_prompt = ChatPromptTemplate.from_template("""Fix the following SQLite SELECT query.
+
+Query:
+{query}
+
+Error:
+{error}
+
+Table Schema:
+{table_info}
+
+Rules:
+- Use ONLY the table and column names in the schema, exactly as written, wrapped in double quotes.
+- Use exactly ONE table. No JOIN, UNION, WITH or subqueries.
+- If the result was empty, check the WHERE values against the possible values in the schema.
+
+Output ONLY the corrected SQL query ending with ;, with no explanations.""")
+
+repair_chain = repair_prompt | llm
+
+
 # 분석 보고서
 response_prompt = ChatPromptTemplate.from_template("""
 You are a professional analyst responsible for writing formal reports based on statistical data. Below is a user question and the result of an SQL query presented in CSV format.
@@ -293,6 +306,8 @@ def contains_chinese(text):
 
 
 def correct_sql_table_names(sql_raw):
+    table_names = catalog.table_names()
+
     def correct_table_name(name):
         return difflib.get_close_matches(name, table_names, n=1, cutoff=0.7)[0] if difflib.get_close_matches(name, table_names, n=1, cutoff=0.7) else name
     for match in re.findall(r'FROM\s+\"([^\"]+)\"|JOIN\s+\"([^\"]+)\"', sql_raw):
@@ -303,6 +318,80 @@ def correct_sql_table_names(sql_raw):
     return sql_raw
 
 
+QUOTED_IDENTIFIER = re.compile(r'"((?:[^"]|"")+)"')
+
+
+# 쿼리에 등장하는 테이블과 그 컬럼명
+def query_tables_and_columns(sql):
+    summaries = catalog.summaries()
+    tables = [t for t in summaries if t in sql]
+    columns = [c["name"] for t in tables for c in summaries[t]["columns"]]
+    return tables, columns
+
+
+# AS 뒤의 별칭과 WITH 절 이름 (따옴표 여부와 관계없이 수집, 본문에서 "별칭"으로 참조해도 보정/거부하지 않도록)
+QUERY_ALIAS = re.compile(r'\bAS\s+(?:"((?:[^"]|"")+)"|([^\s,;()"\']+))', re.IGNORECASE)
+CTE_NAME = re.compile(r'(?:"((?:[^"]|"")+)"|([^\s,;()"\']+))\s+AS\s*\(', re.IGNORECASE)
+
+# 큰따옴표 문자열 값 위치 (비교 연산자/LIKE/BETWEEN/THEN/ELSE 뒤, IN 목록 안): 컬럼명 보정/검증 대상에서 제외
+VALUE_PREFIX = re.compile(
+    r'(?:[=<>]|\bLIKE|\bGLOB|\bBETWEEN|\bBETWEEN\s+\S+\s+AND|\bTHEN|\bELSE|\bIN\s*\()\s*$', re.IGNORECASE
+)
+IN_LIST = re.compile(r'\bIN\s*\(([^()]*)\)', re.IGNORECASE)
+
+
+def query_aliases(sql):
+    return {quoted or bare for pattern in (QUERY_ALIAS, CTE_NAME) for quoted, bare in pattern.findall(sql)}
+
+
+def is_value_position(sql, match):
+    if VALUE_PREFIX.search(sql[:match.start()]):
+        return True
+    return any(m.start(1) <= match.start() < m.end(1) for m in IN_LIST.finditer(sql))
+
+
+# 테이블명 보정과 같은 방식으로 컬럼명도 가장 비슷한 실제 컬럼으로 보정
+# (SQLite는 없는 컬럼의 큰따옴표 식별자를 문자열로 해석해 오류 없이 빈 결과를 내므로 미리 교정,
+#  별칭과 값 위치의 큰따옴표 문자열은 그대로 둠)
+def correct_sql_column_names(sql):
+    tables, columns = query_tables_and_columns(sql)
+    if not columns:
+        return sql
+    known = set(tables) | set(columns) | query_aliases(sql)
+
+    def correct_column_name(match):
+        name = match.group(1)
+        if name in known or is_value_position(sql, match):
+            return match.group(0)
+        candidates = difflib.get_close_matches(name, columns, n=1, cutoff=0.7)
+        return f'"{candidates[0]}"' if candidates else match.group(0)
+    return QUOTED_IDENTIFIER.sub(correct_column_name, sql)
+
+
+# 식별자 위치의 큰따옴표 이름 중 카탈로그 컬럼/테이블/별칭이 아닌 것
+# (SQLite는 이를 문자열로 해석해 EXPLAIN을 통과하고 리터럴 값을 컬럼처럼 돌려줌)
+def unknown_identifiers(sql, tables, columns):
+    known = set(tables) | set(columns) | query_aliases(sql)
+    return [
+        match.group(1) for match in QUOTED_IDENTIFIER.finditer(sql)
+        if match.group(1) not in known and not is_value_position(sql, match)
+    ]
+
+
+# 실행 전 빠른 검증: 카탈로그에 없는 식별자, SQLite EXPLAIN (오류 메시지 반환, 정상이면 None)
+def validate_query(sql):
+    tables, columns = query_tables_and_columns(sql)
+    unknown = unknown_identifiers(sql, tables, columns) if columns else []
+    if unknown:
+        return f"존재하지 않는 컬럼: {', '.join(dict.fromkeys(unknown))}"
+    try:
+        with db_pool.connection() as conn:
+            conn.execute(f"EXPLAIN {sql}")
+    except sqlite3.Error as e:
+        return str(e)
+    return None
+
+
 def extract_select_queries(text):
     return re.findall(r"(SELECT[\s\S]*?;)", text, flags=re.IGNORECASE)
 
@@ -311,6 +400,22 @@ def normalize_tilde_spacing(text: str) -> str:
     return re.sub(r'\s*~\s*', ' ~ ', text)
 
 
+# 스트리밍 중 물결표 정규화: 끝의 공백/~는 다음 조각과 합쳐질 수 있으므로 보류
+class TildeNormalizer:
+    def __init__(self):
+        self.pending = ""
+
+    def feed(self, text):
+        self.pending += text
+        hold = re.search(r'[\s~]*$', self.pending).start()
+        ready, self.pending = self.pending[:hold], self.pending[hold:]
+        return normalize_tilde_spacing(ready)
+
+    def flush(self):
+        ready, self.pending = self.pending, ""
+        return normalize_tilde_spacing(ready)
+
+
 def extract_all_markdown_tables(text):
     lines = text.splitlines()
     tables = []
@@ -364,43 +469,184 @@ def convert_table(lines):
     return df.reset_index(drop=True)
 
 
-def run_sql_analysis(user_query):
+# 프롬프트 토큰 수 (검색 인코더 토크나이저 기준 근사치, 축소 전/후 지표가 같은 단위가 되도록 엔진을 먼저 로딩)
+def count_tokens(text):
+    engine = get_search_engine()
+    engine.load()
+    tokenizer = getattr(engine.model, "tokenizer", None)
+    if tokenizer is None:
+        return len(text)
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+prompt_metrics = {"questions": 0, "pruned": 0, "full_tokens": 0, "prompt_tokens": 0, "repairs": 0}
+_metrics_lock = threading.Lock()
+
+
+# 질문과 매칭된 테이블/컬럼/값만 담은 table_info (매칭이 없거나 검색 실패 시 전체 스키마)
+def build_table_info(user_query):
+    full_info = catalog.table_info()
+    table_info = full_info
+    if SCHEMA_PRUNING:
+        try:
+            table_names = set(catalog.table_names())
+            matches = {}
+            for hit in get_search_engine().match_words(user_query):
+                if hit["file"] in table_names:
+                    if hit["file"] not in matches and len(matches) >= PRUNE_MAX_TABLES:
+                        continue
+                    matches.setdefault(hit["file"], set()).add(hit["word"])
+            if matches:
+                table_info = catalog.pruned_table_info(matches)
+                print(f"[INFO] 스키마 축소: {list(matches)}")
+        except Exception as e:
+            print(f"[WARN] 스키마 축소 실패, 전체 스키마 사용: {e}")
+
+    full_tokens = count_tokens(full_info)
+    prompt_tokens = full_tokens if table_info is full_info else count_tokens(table_info)
+    print(f"[INFO] table_info 토큰 수: {full_tokens} -> {prompt_tokens}")
+    with _metrics_lock:
+        prompt_metrics["questions"] += 1
+        prompt_metrics["pruned"] += table_info is not full_info
+        prompt_metrics["full_tokens"] += full_tokens
+        prompt_metrics["prompt_tokens"] += prompt_tokens
+    return table_info
+
+
+def get_prompt_metrics():
+    with _metrics_lock:
+        metrics = dict(prompt_metrics)
+    if metrics["full_tokens"]:
+        metrics["token_ratio"] = metrics["prompt_tokens"] / metrics["full_tokens"]
+    if sql_cache is not None:
+        metrics["sql_cache"] = sql_cache.stats()
+    metrics["result_cache"] = result_cache.stats()
+    return metrics
+
+
+# 비슷한 질문의 검증된 SQL 조회 (질문 임베딩, 캐시 항목, 캐시 버전)
+# 캐시 버전은 스키마 버전 + 임베딩 모델 버전 (모델이 바뀌면 이전 임베딩과 비교하지 않음)
+def lookup_cached_sql(user_query, schema_version):
+    if sql_cache is None:
+        return None, None, None
+    try:
+        question_vec, model_version = get_search_engine().encode_versioned(user_query.strip())
+        cache_version = f"{schema_version}|{model_version}"
+        cached = sql_cache.lookup(question_vec, cache_version)
+        if cached is not None:
+            print(f"[INFO] SQL 캐시 적중: {cached['question']} (유사도 {cached['score']:.3f})")
+        return question_vec, cached, cache_version
+    except Exception as e:
+        print(f"[WARN] SQL 캐시 조회 실패: {e}")
+        return None, None, None
+
+
+# SELECT 실행 (같은 SQL + 같은 테이블 버전이면 캐시된 결과 사용)
+# 버전을 아는 테이블(카탈로그)을 참조하지 않는 쿼리는 데이터 변경을 감지할 수 없으므로 캐시하지 않음
+def run_query(sql):
+    table_versions = referenced_tables(sql, catalog.table_versions())
+    df = result_cache.get(sql, table_versions) if table_versions else None
+    if df is None:
+        with db_pool.connection() as conn:
+            df = pd.read_sql(sql, conn)
+        if table_versions and not df.empty:
+            result_cache.set(sql, table_versions, df)
+    return df
+
+
+# 쿼리 하나 검증/실행 후 상태 기록 ("ok" / "empty" / "invalid" / "error")
+def execute_query(sql_raw):
+    sql = correct_sql_column_names(correct_sql_table_names(sql_raw))
+    error = validate_query(sql)
+    if error is not None:
+        return {"query": sql, "status": "invalid", "error": error}
+    try:
+        df = run_query(sql)
+    except Exception as e:
+        return {"query": sql, "status": "error", "error": str(e)}
+    if df.empty:
+        return {"query": sql, "status": "empty", "error": "쿼리 실행 결과가 비어있습니다."}
+    return {"query": sql, "status": "ok", "dataframe": df}
+
+
+# 서로 독립적인 SELECT들을 연결 풀에서 동시에 실행 (입력 순서대로 결과 반환)
+def execute_queries(sql_queries):
+    if len(sql_queries) <= 1:
+        return [execute_query(sql) for sql in sql_queries]
+    with ThreadPoolExecutor(max_workers=min(QUERY_WORKERS_PER_REQUEST, len(sql_queries))) as executor:
+        return list(executor.map(execute_query, sql_queries))
+
+
+# 실패한 쿼리 하나만 짧은 수정 프롬프트로 다시 생성
+def repair_query(failed, table_info):
+    tables, _ = query_tables_and_columns(failed["query"])
+    sql_response = repair_chain.invoke({
+        "query": failed["query"],
+        "error": failed["error"],
+        "table_info": catalog.table_info(tables) if tables else table_info,
+    })
+    queries = extract_select_queries(sql_response.content)
+    if not queries:
+        raise ValueError("수정된 SQL 쿼리가 생성되지 않았습니다.")
+    with _metrics_lock:
+        prompt_metrics["repairs"] += 1
+    return queries[0]
+
+
+# 보고서를 토큰 단위로 생성: ("token", 텍스트)를 차례로 내보내고 마지막에 ("done", (보고서, 표 목록, 표 제목))
+def stream_sql_analysis(user_query):
     global table_name, df_table  # streamlit에서 가져가기 위함
 
     sql_max_retry = 3
     sql_retry = 0
     sql_success = False
+    schema_version = catalog.schema_version()
+    question_vec, cached, cache_version = lookup_cached_sql(user_query, schema_version)
+    table_info = None
+    results = None
 
     while not sql_success and sql_retry < sql_max_retry:
         try:
-            sql_response = sql_chain.invoke({
-                "table_info": final_table_info,
-                "top_k": 1000,
-                "user_question": user_query
-            })
-
-            # sql_queries = extract_select_queries(sql_response.content.split('</think>')[-1])
-            sql_queries = extract_select_queries(sql_response.content)
-            df_result = []
-
-            for i, sql_raw in enumerate(sql_queries):
-                print(f"Trying SQL Query {i + 1}...")
-                sql_corrected = correct_sql_table_names(sql_raw)
-                print(sql_corrected)
-                df = pd.read_sql(sql_corrected, db._engine)
-
-                if df.empty:
-                    raise ValueError("쿼리 실행 결과가 비어있습니다.")
-
-                df_result.append({
-                    "query": sql_corrected,
-                    "dataframe": df
+            if cached is not None:
+                results = execute_queries(cached["queries"])
+            elif results is None:
+                if table_info is None:
+                    table_info = build_table_info(user_query)
+                sql_response = sql_chain.invoke({
+                    "table_info": table_info,
+                    "top_k": 1000,
+                    "user_question": user_query
                 })
 
+                # sql_queries = extract_select_queries(sql_response.content.split('</think>')[-1])
+                sql_queries = extract_select_queries(sql_response.content)
+                results = execute_queries(sql_queries)
+            else:
+                # 실패한 쿼리만 수정해 실행 (성공한 쿼리 결과는 유지)
+                failed_ids = [i for i, r in enumerate(results) if r["status"] != "ok"]
+                new_queries = [repair_query(results[i], table_info) for i in failed_ids]
+                for i, result in zip(failed_ids, execute_queries(new_queries)):
+                    results[i] = result
+
+            for i, result in enumerate(results):
+                print(f"SQL Query {i + 1} [{result['status']}]: {result['query']}")
+            failed = [r for r in results if r["status"] != "ok"]
+            if failed:
+                raise ValueError("; ".join(r["error"] for r in failed))
+
+            df_result = [{"query": r["query"], "dataframe": r["dataframe"]} for r in results]
             sql_success = True
+            if cached is None and question_vec is not None and df_result:
+                sql_cache.add(user_query, question_vec, cache_version, [r["query"] for r in df_result])
 
         except Exception as e:
             print(f"에러 발생: {e}")
+            if cached is not None:
+                # 재사용한 SQL이 실패하면 캐시에서 빼고 LLM으로 다시 생성 (재시도 횟수 미차감)
+                sql_cache.discard(cached["id"])
+                cached = None
+                results = None
+                continue
             sql_retry += 1
             print(f"재시도 {sql_retry}/{sql_max_retry}")
 
@@ -408,30 +654,50 @@ def run_sql_analysis(user_query):
         raise RuntimeError("SQL 쿼리 생성 및 실행에 실패했습니다.")
 
 
+    # 보고서 프롬프트용 결과 표 (토큰 예산 내 CSV)
+    result_table = serialize_results(df_result, count_tokens=count_tokens)
+    print(f"[INFO] 결과 표 토큰 수: {count_tokens(result_table)}")
+
     response_max_retry = 3
     response_retry = 0
-    response_success = False
 
-    while not response_success and response_retry < response_max_retry:
+    while True:
+        normalizer = TildeNormalizer()
+        chunks = []
         try:
-            response = response_chain.invoke({"question": user_query, "table": df_result})
-            if not response.content.strip():
+            for chunk in response_chain.stream({"question": user_query, "table": result_table}):
+                text = normalizer.feed(chunk.content)
+                if text:
+                    chunks.append(text)
+                    yield "token", text
+            text = normalizer.flush()
+            if text:
+                chunks.append(text)
+                yield "token", text
+            if not "".join(chunks).strip():
                 raise ValueError("응답이 비어 있음 (response.content가 없음)")
-            response_success = True
-            response_print = normalize_tilde_spacing(response.content)
-            print(response_print)
+            break
         except Exception as e:
             print(f"자연어 응답 생성 오류: {e}")
+            # 이미 클라이언트로 보낸 토큰이 있으면 재시도하지 않음
+            if "".join(chunks).strip():
+                raise RuntimeError(f"자연어 응답 생성 중 오류가 발생했습니다: {e}")
             response_retry += 1
             print(f"자연어 응답 재시도 {response_retry}/{response_max_retry}")
+            if response_retry >= response_max_retry:
+                raise RuntimeError("자연어 응답 생성에 실패했습니다.")
 
-    if not response_success:
-        raise RuntimeError("자연어 응답 생성에 실패했습니다.")
-    
+    response_print = "".join(chunks)
     tables = extract_all_markdown_tables(response_print)
     df_table = [df for df in tables]
     table_name = re.findall(r'!\[(.*?)\]', response_print)
 
     print(response_print)
-    
-    return response_print, df_table, table_name
+
+    yield "done", (response_print, df_table, table_name)
+
+
+def run_sql_analysis(user_query):
+    for kind, payload in stream_sql_analysis(user_query):
+        if kind == "done":
+            return payload
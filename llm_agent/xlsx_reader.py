@@ -0,0 +1,168 @@
+import os
+import re
+import glob
+import time
+import argparse
+import zipfile
+import threading
+import posixpath
+import xml.etree.ElementTree as ET
+import pandas as pd
+
+
+# XLSX 읽기 엔진 ("auto": calamine이 설치되어 있으면 calamine, 없으면 openpyxl)
+XLSX_ENGINE = "auto"
+XLSX_ENGINES = ("auto", "calamine", "openpyxl")
+HEADER_READ_ROWS = 50   # 헤더 추론용으로 먼저 읽는 행 수
+
+_read_stats = []
+_stats_lock = threading.Lock()
+
+
+def resolve_engine(engine=None):
+    engine = engine or XLSX_ENGINE
+    if engine not in XLSX_ENGINES:
+        raise ValueError(f"지원하지 않는 XLSX 엔진: {engine}")
+    if engine == "auto":
+        try:
+            import python_calamine  # noqa: F401
+            return "calamine"
+        except ImportError:
+            return "openpyxl"
+    return engine
+
+
+# dtype=object로 읽은 열 중 값이 모두 숫자인 열은 pd.read_excel과 같이 숫자 dtype으로 변환
+def restore_numeric_columns(df):
+    for col in df.columns:
+        values = df[col].dropna()
+        if len(values) and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            df[col] = pd.to_numeric(df[col])
+    return df
+
+
+# 헤더 구간(header_rows행)과 본문을 나누어 읽기 (워크북은 한 번만 열고, 셀 값은 pd.read_excel과 동일)
+def read_sheet_split(path, sheet_name=0, header_rows=HEADER_READ_ROWS, engine=None):
+    engine = resolve_engine(engine)
+    start = time.perf_counter()
+    with pd.ExcelFile(path, engine=engine) as xls:
+        open_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df_head = xls.parse(sheet_name, header=None, nrows=header_rows, dtype=object)
+        header_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df_body = xls.parse(sheet_name, header=None, skiprows=header_rows, dtype=object)
+        body_time = time.perf_counter() - start
+
+    # 헤더 구간 끝의 빈 행은 잘려서 읽히므로 본문이 있으면 행 수를 맞춤
+    if len(df_body) and len(df_head) < header_rows:
+        df_head = df_head.reindex(range(header_rows))
+
+    record_read(path, engine, open_time + header_time + body_time, len(df_head) + len(df_body),
+                open_time=open_time, header_time=header_time, body_time=body_time)
+    return df_head, df_body
+
+
+def read_sheet(path, sheet_name=0, engine=None):
+    df_head, df_body = read_sheet_split(path, sheet_name, engine=engine)
+    df = pd.concat([df_head, df_body], ignore_index=True)
+    return restore_numeric_columns(df)
+
+
+# 워크북의 워크시트 목록 [(시트 이름, 시트 XML 경로), ...] (차트 시트 제외, 워크북 순서)
+def _workbook_sheets(zf):
+    ns = {
+        "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+        "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+        "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    }
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target") for r in rels.findall("rel:Relationship", ns)}
+
+    sheets = []
+    for sheet in ET.fromstring(zf.read("xl/workbook.xml")).findall("m:sheets/m:sheet", ns):
+        target = targets[sheet.get(f"{{{ns['r']}}}id")]
+        if target.startswith("/"):
+            xml_path = target.lstrip("/")
+        else:
+            xml_path = posixpath.normpath(posixpath.join("xl", target))
+        if "/worksheets/" in xml_path:
+            sheets.append((sheet.get("name"), xml_path))
+    return sheets
+
+
+def list_sheet_names(path):
+    with zipfile.ZipFile(path) as zf:
+        return [name for name, _ in _workbook_sheets(zf)]
+
+
+# 시트 XML 경로 찾기 (sheet_name: 시트 이름 또는 0부터 시작하는 순서)
+def _sheet_xml_path(zf, sheet_name):
+    sheets = _workbook_sheets(zf)
+    if isinstance(sheet_name, int):
+        return sheets[sheet_name][1]
+    return next(xml_path for name, xml_path in sheets if name == sheet_name)
+
+
+def _cell_index(ref):
+    letters, digits = re.fullmatch(r"\$?([A-Z]+)\$?(\d+)", ref).groups()
+    col = 0
+    for ch in letters:
+        col = col * 26 + ord(ch) - ord("A") + 1
+    return int(digits) - 1, col - 1
+
+
+MERGE_CELL_PATTERN = re.compile(rb'<(?:\w+:)?mergeCell\s[^>]*?ref="([^"]+)"')
+
+
+# 시트의 병합 셀 범위 [(시작 행, 시작 열, 끝 행, 끝 열), ...] (0부터, 끝 포함, pd.read_excel(header=None)의 행/열 위치와 같음)
+# 엔진과 무관하게 시트 XML의 <mergeCells>만 찾아 읽음 (openpyxl read_only 모드는 병합 정보를 주지 않음)
+def read_merged_ranges(path, sheet_name=0):
+    with zipfile.ZipFile(path) as zf:
+        xml = zf.read(_sheet_xml_path(zf, sheet_name))
+
+    start = xml.find(b"mergeCells")
+    if start < 0:
+        return []
+    ranges = []
+    for ref in MERGE_CELL_PATTERN.findall(xml, start):
+        first, _, last = ref.decode().partition(":")
+        r0, c0 = _cell_index(first)
+        r1, c1 = _cell_index(last or first)
+        ranges.append((r0, c0, r1, c1))
+    return ranges
+
+
+def record_read(path, engine, seconds, rows, **detail):
+    stat = {"file": os.path.basename(path), "engine": engine, "seconds": seconds, "rows": rows, **detail}
+    with _stats_lock:
+        _read_stats.append(stat)
+    print(f"[INFO] XLSX 읽기 ({engine}): {stat['file']} {rows}행, {seconds:.2f}s")
+
+
+def get_read_stats():
+    with _stats_lock:
+        return list(_read_stats)
+
+
+# 엔진별 읽기 시간 비교 (기존 pd.read_excel 전체 읽기 기준)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="XLSX 엔진별 읽기 시간 비교")
+    parser.add_argument("xlsx_dir", nargs="?", default="./data/xlsx_data")
+    args = parser.parse_args()
+
+    for path in sorted(glob.glob(os.path.join(args.xlsx_dir, "*.xlsx"))):
+        start = time.perf_counter()
+        baseline = pd.read_excel(path, header=None)
+        baseline_time = time.perf_counter() - start
+        times = {"read_excel(openpyxl)": baseline_time}
+        for engine in ("openpyxl", "calamine"):
+            try:
+                start = time.perf_counter()
+                read_sheet(path, engine=engine)
+                times[engine] = time.perf_counter() - start
+            except ImportError as e:
+                times[engine] = f"사용 불가 ({e})"
+        print(os.path.basename(path), baseline.shape, times)
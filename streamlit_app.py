@@ -6,7 +6,6 @@ import pandas as pd
 from datetime import datetime
 from streamlit_option_menu import option_menu
 from streamlit_modal import Modal
-from llm_agent.search import search_faiss_with_partial_and_similarity, load_components
 from llm_agent.sql_report import run_sql_analysis
 from llm_agent.graph import run_graph_generation
 from hwpx_report.model_json import generate_structured_report
@@ -86,6 +85,11 @@ with st.sidebar:
         st.session_state.search_results = []
     if "uploaded_files" not in st.session_state:
         st.session_state["uploaded_files"] = []
+    # 서버에 등록한 업로드 작업 (재실행 때 같은 파일을 다시 올리지 않고 저장된 작업 id만 확인)
+    if "submitted_files" not in st.session_state:
+        st.session_state["submitted_files"] = set()
+    if "upload_jobs" not in st.session_state:
+        st.session_state["upload_jobs"] = {}  # job_id -> 파일명 (처리 중인 작업)
     if "selected_reports" not in st.session_state:
         st.session_state.selected_reports = []
     if "selected_preview_file" not in st.session_state:
@@ -98,11 +102,13 @@ with st.sidebar:
     def on_search():
         keyword = st.session_state["search_input"].strip()
         if keyword:
-            model, index, meta, file_token_index = load_components()
-            results = search_faiss_with_partial_and_similarity(
-                keyword, model, index, meta, file_token_index
-            )
-            st.session_state.search_results = [r['file'] for r in results]
+            try:
+                response = requests.post("http://localhost:5000/search", json={"query": keyword})
+                response.raise_for_status()
+                st.session_state.search_results = response.json().get("results", [])
+            except Exception as e:
+                st.error(f"❌ 검색 서버 오류: {e}")
+                st.session_state.search_results = []
         else:
             st.session_state.search_results = []
 
@@ -143,20 +149,46 @@ with st.sidebar:
         )
 
         if uploaded_files:
+            # 파일을 모두 먼저 올리고(작업 등록), 등록된 작업은 세션에 기록해 재실행 때 다시 올리지 않음
             for file in uploaded_files:
-                if file.name not in st.session_state["uploaded_files"]:
+                if file.name not in st.session_state["submitted_files"]:
                     files = {"file": (file.name, file, file.type)}
                     try:
                         response = requests.post("http://localhost:5000/upload", files=files)
-                        if response.status_code == 200:
-                            st.session_state["uploaded_files"].append(file.name)
-                            if file.name not in st.session_state["selected_reports"]:
-                                st.session_state["selected_reports"].append(file.name)
+                        if response.status_code == 202:
+                            st.session_state["upload_jobs"][response.json()["job_id"]] = file.name
+                            st.session_state["submitted_files"].add(file.name)
                         else:
                             st.error(f"❌ {file.name} 업로드 실패")
                     except Exception as e:
                         st.error(f"❌ 서버 오류: {e}")
 
+        # 서버에서 병렬로 처리되는 동안 세션에 저장된 작업 상태를 확인 (위젯 조작으로 재실행돼도 이어서 확인)
+        jobs = dict(st.session_state["upload_jobs"])
+        if jobs:
+            progress = st.progress(0.0, text=f"파일 처리 중... (0/{len(jobs)})")
+            pending = st.session_state["upload_jobs"]
+            while pending:
+                time.sleep(0.5)
+                for job_id, name in list(pending.items()):
+                    try:
+                        job = requests.get(f"http://localhost:5000/jobs/{job_id}").json()
+                    except Exception as e:
+                        st.error(f"❌ 서버 오류: {e}")
+                        pending.pop(job_id)
+                        continue
+                    if job.get("status") == "done":
+                        pending.pop(job_id)
+                        st.session_state["uploaded_files"].append(name)
+                        if name not in st.session_state["selected_reports"]:
+                            st.session_state["selected_reports"].append(name)
+                    elif job.get("status") in ("failed", None):
+                        pending.pop(job_id)
+                        st.error(f"❌ {name} 처리 실패: {job.get('error')}")
+                done = len(jobs) - len(pending)
+                progress.progress(done / len(jobs), text=f"파일 처리 중... ({done}/{len(jobs)})")
+            progress.empty()
+
     # ===== 보고서 리스트 박스 + 매핑 =====
     csv_dir = "./data/csv_data"
     csv_files = [f for f in os.listdir(csv_dir) if f.endswith(".csv")]
@@ -322,6 +354,10 @@ if prompt := st.chat_input("질문을 입력하세요"):
                     elif event.event == "graph_query":
                         st.session_state.graph_table_name = json.loads(event.data)["table_name"]
 
+                    elif event.event == "token":
+                        full_response += json.loads(event.data)["text"]
+                        message_placeholder.markdown(full_response)
+
                     elif event.event == "end":
                         break
 